@@ -0,0 +1,200 @@
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import case, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from config import FEVER_THRESHOLD
+from models.saude import SaudeFeverDay, SaudeRecord, SaudeRollup
+from models.user import Child
+
+
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _is_new_fever(session: Session, record: SaudeRecord, day: date) -> bool:
+    """
+    Febre conta a criança uma vez por dia. A deduplicação é feita pelo banco
+    (chave primária de SaudeFeverDay), então registros simultâneos não contam duas vezes.
+    """
+    if record.temperatura is None or record.temperatura < FEVER_THRESHOLD:
+        return False
+    insert = UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(SaudeFeverDay.__table__).values(child_id=record.child_id, day=day).on_conflict_do_nothing()
+        return session.execute(statement).rowcount == 1
+    try:
+        with session.begin_nested():
+            session.add(SaudeFeverDay(child_id=record.child_id, day=day))
+        return True
+    except IntegrityError:
+        return False
+
+
+def apply_record(session: Session, record: SaudeRecord, classroom: str):
+    """
+    Atualiza o resumo do dia/turma com um novo registro (incremental).
+    Deve ser chamado após session.flush(), na mesma transação do registro.
+    O incremento é feito pelo banco (upsert), sem ler-modificar-gravar em Python,
+    para não perder registros gravados ao mesmo tempo.
+    """
+    day = record.date.date()
+    temperatura = record.temperatura
+    delta = {
+        "count": 1,
+        "temp_count": 0 if temperatura is None else 1,
+        "temp_sum": temperatura or 0.0,
+        "temp_max": temperatura,
+        "fever_count": int(_is_new_fever(session, record, day)),
+    }
+
+    insert = UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if insert is None:
+        # Outros bancos: trava a linha do resumo até o fim da transação
+        statement = (
+            select(SaudeRollup)
+            .where(SaudeRollup.classroom == classroom, SaudeRollup.day == day)
+            .with_for_update()
+        )
+        rollup = session.exec(statement).first()
+        if rollup is None:
+            session.add(SaudeRollup(classroom=classroom, day=day, **delta))
+            return
+        rollup.count += delta["count"]
+        rollup.temp_count += delta["temp_count"]
+        rollup.temp_sum += delta["temp_sum"]
+        if temperatura is not None and (rollup.temp_max is None or temperatura > rollup.temp_max):
+            rollup.temp_max = temperatura
+        rollup.fever_count += delta["fever_count"]
+        session.add(rollup)
+        return
+
+    columns = SaudeRollup.__table__.c
+    statement = insert(SaudeRollup.__table__).values(classroom=classroom, day=day, **delta)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[columns.classroom, columns.day],
+        set_={
+            "count": columns.count + excluded.count,
+            "temp_count": columns.temp_count + excluded.temp_count,
+            "temp_sum": columns.temp_sum + excluded.temp_sum,
+            "temp_max": case(
+                (excluded.temp_max.is_(None), columns.temp_max),
+                (columns.temp_max.is_(None), excluded.temp_max),
+                (excluded.temp_max > columns.temp_max, excluded.temp_max),
+                else_=columns.temp_max,
+            ),
+            "fever_count": columns.fever_count + excluded.fever_count,
+        },
+    )
+    session.execute(statement)
+
+
+def rebuild_rollups(session: Session, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Recalcula (backfill) os resumos a partir dos registros brutos, de forma vetorizada.
+    start/end são inclusivos; sem eles, recalcula tudo. Retorna o número de resumos gravados.
+    """
+    statement = select(Child.classroom, SaudeRecord.date, SaudeRecord.temperatura, SaudeRecord.child_id).join(
+        Child, Child.id == SaudeRecord.child_id
+    )
+    existing = select(SaudeRollup)
+    fever_days = delete(SaudeFeverDay)
+    if start is not None:
+        statement = statement.where(SaudeRecord.date >= datetime.combine(start, time.min))
+        existing = existing.where(SaudeRollup.day >= start)
+        fever_days = fever_days.where(SaudeFeverDay.day >= start)
+    if end is not None:
+        statement = statement.where(SaudeRecord.date < datetime.combine(end + timedelta(days=1), time.min))
+        existing = existing.where(SaudeRollup.day <= end)
+        fever_days = fever_days.where(SaudeFeverDay.day <= end)
+    rows = session.exec(statement).all()
+
+    for rollup in session.exec(existing).all():
+        session.delete(rollup)
+    session.execute(fever_days)
+    # Remove antes de inserir: (classroom, day) é único
+    session.flush()
+    if not rows:
+        session.commit()
+        return 0
+
+    classrooms, classroom_idx = np.unique(np.array([r[0] for r in rows]), return_inverse=True)
+    days = np.array([r[1].date() for r in rows], dtype="datetime64[D]").astype(np.int64)
+    temps = np.array([np.nan if r[2] is None else r[2] for r in rows], dtype=float)
+    child_ids = np.array([r[3] for r in rows], dtype=np.int64)
+
+    # Um grupo por (turma, dia)
+    groups, group_idx = np.unique(np.stack([classroom_idx, days], axis=1), axis=0, return_inverse=True)
+    group_idx = group_idx.reshape(-1)
+    n = len(groups)
+
+    has_temp = ~np.isnan(temps)
+    count = np.bincount(group_idx, minlength=n)
+    temp_count = np.bincount(group_idx, weights=has_temp, minlength=n)
+    temp_sum = np.bincount(group_idx, weights=np.where(has_temp, temps, 0.0), minlength=n)
+    temp_max = np.full(n, -np.inf)
+    np.maximum.at(temp_max, group_idx[has_temp], temps[has_temp])
+
+    fever = has_temp & (temps >= FEVER_THRESHOLD)
+    fever_pairs = np.unique(np.stack([group_idx[fever], child_ids[fever]], axis=1), axis=0)
+    fever_count = np.bincount(fever_pairs[:, 0], minlength=n)
+
+    epoch = date(1970, 1, 1)
+    # Marcadores (criança, dia) usados pelo incremental em apply_record
+    for child_id, d in np.unique(np.stack([child_ids[fever], days[fever]], axis=1), axis=0):
+        session.add(SaudeFeverDay(child_id=int(child_id), day=epoch + timedelta(days=int(d))))
+    for i, (c, d) in enumerate(groups):
+        session.add(SaudeRollup(
+            classroom=str(classrooms[c]),
+            day=epoch + timedelta(days=int(d)),
+            count=int(count[i]),
+            temp_count=int(temp_count[i]),
+            temp_sum=float(temp_sum[i]),
+            temp_max=float(temp_max[i]) if np.isfinite(temp_max[i]) else None,
+            fever_count=int(fever_count[i]),
+        ))
+    session.commit()
+    return n
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def trend(session: Session, start: date, end: date, classroom: Optional[str] = None, bucket: str = "day") -> List[dict]:
+    """Série temporal por turma a partir dos resumos (sem ler os registros brutos)"""
+    statement = select(SaudeRollup).where(SaudeRollup.day >= start, SaudeRollup.day <= end)
+    if classroom is not None:
+        statement = statement.where(SaudeRollup.classroom == classroom)
+    statement = statement.order_by(SaudeRollup.day, SaudeRollup.classroom)
+
+    buckets: "OrderedDict[tuple, dict]" = OrderedDict()
+    for rollup in session.exec(statement).all():
+        key = (rollup.classroom, _bucket_start(rollup.day, bucket))
+        item = buckets.setdefault(key, {
+            "classroom": key[0], "start": key[1], "count": 0, "temp_count": 0,
+            "temp_sum": 0.0, "temp_max": None, "fever_child_days": 0,
+        })
+        item["count"] += rollup.count
+        item["temp_count"] += rollup.temp_count
+        item["temp_sum"] += rollup.temp_sum
+        if rollup.temp_max is not None:
+            item["temp_max"] = rollup.temp_max if item["temp_max"] is None else max(item["temp_max"], rollup.temp_max)
+        item["fever_child_days"] += rollup.fever_count
+
+    result = []
+    for item in buckets.values():
+        temp_count = item.pop("temp_count")
+        temp_sum = item.pop("temp_sum")
+        item["temp_mean"] = round(temp_sum / temp_count, 2) if temp_count else None
+        result.append(item)
+    return result
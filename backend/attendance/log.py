@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from config import ATTENDANCE_BATCH_SIZE, ATTENDANCE_FLUSH_SECONDS, ATTENDANCE_IDLE_SECONDS
+from database.db import engine as default_engine
+from database.tenancy import get_tenant_engine
+from models.presenca import PresencaEvento, PresencaTipo
+
+logger = logging.getLogger(__name__)
+
+# (child_id, classroom, tipo, occurred_at)
+PendingEvent = Tuple[int, str, PresencaTipo, float]
+DAY_SECONDS = 24 * 3600
+
+
+def start_of_day(now: Optional[float] = None) -> float:
+    day = datetime.fromtimestamp(now if now is not None else time.time())
+    return day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+class AttendanceLog:
+    """
+    Presença de um banco (instalação padrão ou tenant).
+    Eventos entram num buffer em memória e são gravados em lote pelo flusher;
+    a visão "quem está presente em cada turma" é atualizada na hora.
+    """
+
+    def __init__(self, tenant: Optional[str] = None):
+        self.tenant = tenant
+        self.present: Dict[str, Dict[int, float]] = defaultdict(dict)  # turma -> {child_id: desde}
+        self._last: Dict[int, float] = {}  # child_id -> occurred_at do último evento aplicado
+        self._pending: List[PendingEvent] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.day = start_of_day()
+        self.last_used = time.monotonic()
+
+    def _bind(self) -> Engine:
+        # Resolvida a cada uso: a engine do tenant pode ter saído do LRU (e sido descartada)
+        return get_tenant_engine(self.tenant, default_engine) if self.tenant else default_engine
+
+    def _roll_day(self):
+        """Virou o dia: a presença recomeça zerada. Chamar com self._lock"""
+        today = start_of_day()
+        if today != self.day:
+            self.present = defaultdict(dict)
+            self._last = {}
+            self.day = today
+
+    def _apply(self, child_id: int, classroom: str, tipo: PresencaTipo, occurred_at: float):
+        # Mesma ordem do rebuild(): vale o evento mais recente da criança no dia,
+        # mesmo que um evento retroativo chegue depois
+        if not self.day <= occurred_at < self.day + DAY_SECONDS or occurred_at < self._last.get(child_id, 0):
+            return
+        self._last[child_id] = occurred_at
+        if tipo == PresencaTipo.CHECK_IN:
+            # Criança só pode estar presente em uma turma
+            for children in self.present.values():
+                children.pop(child_id, None)
+            self.present[classroom][child_id] = occurred_at
+        else:
+            for children in self.present.values():
+                children.pop(child_id, None)
+
+    def rebuild(self):
+        """Reconstrói a visão de presença a partir do log do dia (usado no startup)"""
+        self.day = start_of_day()
+        with Session(self._bind()) as session:
+            statement = (
+                select(PresencaEvento)
+                .where(PresencaEvento.occurred_at >= self.day, PresencaEvento.occurred_at < self.day + DAY_SECONDS)
+                .order_by(PresencaEvento.occurred_at, PresencaEvento.id)
+            )
+            events = session.exec(statement).all()
+        with self._lock:
+            self.present = defaultdict(dict)
+            self._last = {}
+            for event in events:
+                self._apply(event.child_id, event.classroom, event.tipo, event.occurred_at)
+            # Eventos ainda no buffer também contam
+            for pending in self._pending:
+                self._apply(*pending)
+
+    def record(self, child_id: int, classroom: str, tipo: PresencaTipo, occurred_at: Optional[float] = None) -> bool:
+        """Aceita o evento (sem tocar no banco). Retorna True se o buffer encheu e pede flush"""
+        occurred_at = occurred_at if occurred_at is not None else time.time()
+        with self._lock:
+            self._roll_day()
+            self._pending.append((child_id, classroom, tipo, occurred_at))
+            self._apply(child_id, classroom, tipo, occurred_at)
+            return len(self._pending) >= ATTENDANCE_BATCH_SIZE
+
+    def present_in(self, classroom: str) -> Dict[int, float]:
+        with self._lock:
+            self._roll_day()
+            return dict(self.present.get(classroom, {}))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            self._roll_day()
+            return {classroom: len(children) for classroom, children in self.present.items() if children}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Grava o buffer numa única transação. Em caso de erro os eventos voltam para o buffer"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with Session(self._bind()) as session:
+                    session.add_all([
+                        PresencaEvento(child_id=child_id, classroom=classroom, tipo=tipo, occurred_at=occurred_at)
+                        for child_id, classroom, tipo, occurred_at in batch
+                    ])
+                    session.commit()
+            except Exception:
+                with self._lock:
+                    self._pending = batch + self._pending
+                raise
+            return len(batch)
+
+
+class AttendanceService:
+    """
+    Um AttendanceLog por banco e uma thread que grava os buffers a cada ATTENDANCE_FLUSH_SECONDS.
+    Logs de tenants sem uso há ATTENDANCE_IDLE_SECONDS saem da memória depois de gravados.
+    """
+
+    def __init__(self, flush_seconds: float = ATTENDANCE_FLUSH_SECONDS,
+                 idle_seconds: float = ATTENDANCE_IDLE_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.idle_seconds = idle_seconds
+        self._logs: Dict[Optional[str], AttendanceLog] = {}
+        # Reentrante: record() segura o lock em volta de get_log()
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get_log(self, tenant: Optional[str] = None) -> AttendanceLog:
+        log = self._logs.get(tenant)
+        if log is None:
+            with self._lock:
+                log = self._logs.get(tenant)
+                if log is None:
+                    log = AttendanceLog(tenant)
+                    log.rebuild()
+                    self._logs[tenant] = log
+        log.last_used = time.monotonic()
+        return log
+
+    def record(self, tenant: Optional[str], child_id: int, classroom: str, tipo: PresencaTipo,
+               occurred_at: Optional[float] = None):
+        # Sob o lock: o log não pode ser descartado entre get_log() e o registro do evento
+        with self._lock:
+            full = self.get_log(tenant).record(child_id, classroom, tipo, occurred_at)
+        if full:
+            self._wake.set()
+
+    def flush_all(self) -> int:
+        flushed = 0
+        for tenant, log in list(self._logs.items()):
+            try:
+                flushed += log.flush()
+            except Exception:
+                logger.exception("Falha ao gravar presença (tenant=%s); nova tentativa no próximo ciclo", tenant)
+        self._retire_idle()
+        return flushed
+
+    def _retire_idle(self):
+        """Descarta logs de tenants ociosos já gravados; a instalação padrão fica sempre"""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            for tenant, log in list(self._logs.items()):
+                # record() também segura este lock: nenhum evento entra num log já descartado
+                if tenant is not None and log.last_used < cutoff and log.pending == 0:
+                    del self._logs[tenant]
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush_all()
+
+    def start(self):
+        """Reconstrói a presença da instalação padrão e inicia o flusher"""
+        self.get_log(None)
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="presenca-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush_all()
+
+
+attendance = AttendanceService()
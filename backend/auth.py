@@ -1,17 +1,30 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
-from jose import JWTError, jwt
+from jose import jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import hashlib
+import logging
+import secrets
+import threading
+import time
+import uuid
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
 from database.session import get_session
-from models.user import User
+from database.tenancy import engine_key, request_claims
+from models.user import User, UserType
+from models.refresh_token import RefreshToken
+from config import SECRET_KEY, ALGORITHM
+
+logger = logging.getLogger(__name__)
 
 # Security constants
-SECRET_KEY = "your-secret-key-here"  # Change this in production!
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+REVOCATION_SYNC_SECONDS = 60
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -41,20 +54,111 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+# Refresh tokens
+class RevocationList:
+    """
+    Famílias de refresh token revogadas, mantidas em memória.
+    Verificar um token é só um lookup no dicionário; o banco é consultado
+    no máximo a cada REVOCATION_SYNC_SECONDS para pegar revogações
+    feitas por outros workers.
+    """
+
+    def __init__(self, sync_seconds: float = REVOCATION_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._revoked: Dict[str, int] = {}  # family_id -> expires_at
+        self._last_sync: Dict[str, float] = {}  # url do banco -> último sync
+        self._lock = threading.Lock()
+
+    def add(self, family_id: str, expires_at: int):
+        with self._lock:
+            self._revoked[family_id] = max(expires_at, self._revoked.get(family_id, 0))
+
+    def is_revoked(self, family_id: Optional[str]) -> bool:
+        return family_id is not None and family_id in self._revoked
+
+    def maybe_sync(self, bind: Engine):
+        """Busca revogações recentes no banco, se o último sync deste banco já venceu"""
+        key = engine_key(bind)
+        now = time.time()
+        last_sync = self._last_sync.get(key)
+        if last_sync is not None and now - last_sync < self.sync_seconds:
+            return
+        # Pequena folga para revogações gravadas durante o último sync
+        since = 0 if last_sync is None else int(last_sync) - 5
+        statement = (
+            select(RefreshToken.family_id, func.max(RefreshToken.expires_at))
+            .where(RefreshToken.revoked_at >= since, RefreshToken.expires_at > int(now))
+            .group_by(RefreshToken.family_id)
+        )
+        try:
+            with Session(bind) as session:
+                rows = session.exec(statement).all()
+        except Exception:
+            # Não derruba a autenticação; tenta de novo no próximo intervalo
+            logger.exception("Falha ao sincronizar revogações de %s", key)
+            with self._lock:
+                self._last_sync[key] = now
+            return
+        with self._lock:
+            for family_id, expires_at in rows:
+                self._revoked[family_id] = max(expires_at, self._revoked.get(family_id, 0))
+            self._revoked = {f: exp for f, exp in self._revoked.items() if exp > now}
+            self._last_sync[key] = now
+
+revocation_list = RevocationList()
+
+def hash_refresh_token(token: str) -> str:
+    # Token aleatório de 256 bits: SHA-256 basta, sem custo de bcrypt
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_refresh_token(session: Session, subject: str, role: Optional[str] = None,
+                         family_id: Optional[str] = None) -> Tuple[str, RefreshToken]:
+    """Adiciona um novo refresh token à sessão (só o hash é gravado). Retorna (token, registro)"""
+    token = secrets.token_urlsafe(32)
+    record = RefreshToken(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        subject=subject,
+        role=role,
+        expires_at=int(time.time()) + REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
+    )
+    session.add(record)
+    return token, record
+
+def revoke_token_family(session: Session, family_id: str):
+    """Revoga todos os refresh tokens (e access tokens derivados) de um login"""
+    now = int(time.time())
+    records = session.exec(select(RefreshToken).where(RefreshToken.family_id == family_id)).all()
+    for record in records:
+        if record.revoked_at is None:
+            record.revoked_at = now
+            session.add(record)
+    revocation_list.add(family_id, max((r.expires_at for r in records), default=now))
+
+def _token_subject(request: Request, session: Session) -> Optional[str]:
+    """
+    Usuário (sub) do token Bearer; None se inválido, expirado ou revogado.
+    O token já foi decodificado pelos middlewares; a Session só abre conexão
+    se o sync da lista de revogação estiver vencido.
+    """
+    payload = request_claims(request)
+    if not payload:
+        return None
+    revocation_list.maybe_sync(session.get_bind())
+    if revocation_list.is_revoked(payload.get("fid")):
+        return None
+    return payload.get("sub")
+
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = _token_subject(request, session)
+    if username is None:
         raise credentials_exception
-    
+
     statement = select(User).where(User.username == username)
     user = session.exec(statement).first()
     if user is None:
@@ -66,6 +170,17 @@ def get_current_active_user(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+def get_current_staff_user(current_user: User = Depends(get_current_active_user)):
+    """Professores e administradores"""
+    if current_user.user_type not in (UserType.TEACHER, UserType.ADMIN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Staff only")
+    return current_user
+
+def get_current_admin_user(current_user: User = Depends(get_current_active_user)):
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
+
 
 # from fastapi import Depends, HTTPException, status
 # from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -98,20 +213,13 @@ def get_current_active_user(current_user: User = Depends(get_current_user)):
 #     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 # Middleware de autenticação
-def decode_access_token(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token inválido",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return {"username": username}
-    except JWTError:
+def decode_access_token(request: Request, token: str = Depends(oauth2_scheme),
+                        session: Session = Depends(get_session)):
+    username = _token_subject(request, session)
+    if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido ou expirado.",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+    return {"username": username}
\ No newline at end of file
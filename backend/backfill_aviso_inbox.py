@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Script para entregar avisos existentes nas caixas de entrada (instalação padrão ou tenants)"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlmodel import Session
+from database.db import engine
+from database.tenancy import get_tenant_engine
+from feeds import aviso_feed
+
+def backfill_aviso_inbox(tenant=None):
+    """Entrega os avisos existentes de um banco; sem tenant usa a instalação padrão"""
+    bind = get_tenant_engine(tenant, engine) if tenant else engine
+    with Session(bind) as session:
+        total = aviso_feed.backfill(session)
+        session.commit()
+    print(f"{tenant or 'padrão'}: {total} avisos entregues")
+
+if __name__ == "__main__":
+    # Uso: python backfill_aviso_inbox.py [tenant ...]
+    for tenant in sys.argv[1:] or [None]:
+        backfill_aviso_inbox(tenant)
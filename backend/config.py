@@ -0,0 +1,60 @@
+import os
+
+# Security
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # Change this in production!
+ALGORITHM = "HS256"
+
+# Read replicas: after a write, the same user reads from the primary for this window.
+# Tracked in process memory, so it only holds with a single worker process.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Multi-tenant (one deployment, many CMEIs)
+# TENANT_ROUTING: "file" -> one SQLite file per tenant, "schema" -> one schema per tenant
+TENANT_ROUTING = os.getenv("TENANT_ROUTING", "file")
+TENANT_DATABASE_URL = os.getenv("TENANT_DATABASE_URL", "sqlite:///./tenants/{tenant}.db")
+TENANT_MAX_ENGINES = int(os.getenv("TENANT_MAX_ENGINES", "32"))
+# Domain suffix used to resolve the tenant from the Host header (e.g. "cmei.example.com")
+TENANT_HOST_SUFFIX = os.getenv("TENANT_HOST_SUFFIX", "")
+
+# Reverse proxies (comma separated IPs) whose X-Forwarded-For header is trusted for the client IP
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "").split(",") if ip.strip()}
+
+# Admission control (token buckets + global concurrency limit)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "5"))  # requests/second per user
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "20"))
+# Requests without a token are limited per client IP (many parents may share one NAT/proxy IP)
+ADMISSION_ANONYMOUS_RATE = float(os.getenv("ADMISSION_ANONYMOUS_RATE", "20"))  # requests/second per IP
+ADMISSION_ANONYMOUS_BURST = float(os.getenv("ADMISSION_ANONYMOUS_BURST", "60"))
+ADMISSION_ROUTE_RATE = float(os.getenv("ADMISSION_ROUTE_RATE", "200"))  # requests/second per route
+ADMISSION_ROUTE_BURST = float(os.getenv("ADMISSION_ROUTE_BURST", "400"))
+# Keep below the threadpool size used by sync routes (40 by default)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+
+# Attachments (photos of avisos / rotinas), content-addressed on local disk
+ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", "./anexos")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(20 * 1024 * 1024)))
+THUMBNAIL_SIZES = (320, 1280)
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+# Health analytics
+FEVER_THRESHOLD = float(os.getenv("FEVER_THRESHOLD", "37.8"))
+
+# Avisos feed: materialized per-parent inbox + parent -> classrooms cache
+AVISO_INBOX_ENABLED = os.getenv("AVISO_INBOX_ENABLED", "true").lower() == "true"
+MEMBERSHIP_CACHE_SECONDS = float(os.getenv("MEMBERSHIP_CACHE_SECONDS", "300"))
+
+# Idempotency-Key support for write requests
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", str(1024 * 1024)))
+
+# On-demand profiling (admin only). Disabled: no middleware, no routes.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_INTERVAL_SECONDS = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.005"))
+
+# Attendance (check-in/check-out): events are buffered and written in batches.
+# Events accepted within the last flush interval are lost if the process crashes.
+ATTENDANCE_FLUSH_SECONDS = float(os.getenv("ATTENDANCE_FLUSH_SECONDS", "1"))
+ATTENDANCE_BATCH_SIZE = int(os.getenv("ATTENDANCE_BATCH_SIZE", "200"))
+# A tenant's in-memory presence view unused for this long is dropped (rebuilt from the log on next use)
+ATTENDANCE_IDLE_SECONDS = float(os.getenv("ATTENDANCE_IDLE_SECONDS", "600"))
\ No newline at end of file
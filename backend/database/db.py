@@ -1,11 +1,17 @@
 from sqlmodel import SQLModel, create_engine
+import itertools
 import os
 
 # Define database URL - using sqlite for development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cmei_app.db")
 
+# Optional read replicas, comma separated (e.g. "sqlite:///./replica.db")
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
 # Create engine
 engine = create_engine(DATABASE_URL, echo=True)
+replica_engines = [create_engine(url) for url in DATABASE_REPLICA_URLS]
+_replica_cycle = itertools.cycle(replica_engines)
 
 def create_db_and_tables():
     """Create all tables defined in the models"""
@@ -13,4 +19,10 @@ def create_db_and_tables():
 
 def get_engine():
     """Return the engine instance"""
-    return engine
\ No newline at end of file
+    return engine
+
+def get_read_engine():
+    """Return the next read replica (round-robin), or the primary if none is configured"""
+    if not replica_engines:
+        return engine
+    return next(_replica_cycle)
\ No newline at end of file
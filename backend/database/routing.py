@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from fastapi import Request
+
+from config import READ_YOUR_WRITES_SECONDS, TRUSTED_PROXIES
+from .tenancy import request_claims
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWrites:
+    """
+    Lembra quem escreveu recentemente para que as próximas leituras desse
+    usuário vão para o primário até a réplica alcançar (stickiness).
+    O estado fica na memória do processo: com vários workers, a leitura só é
+    "sticky" se cair no mesmo worker da escrita (rode um worker só ao usar réplicas).
+    """
+
+    def __init__(self, window_seconds: float = READ_YOUR_WRITES_SECONDS):
+        self.window_seconds = window_seconds
+        self._last_write: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark_write(self, identity: str):
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[identity] = now
+            # Limpeza preguiçosa para o dicionário não crescer indefinidamente
+            if len(self._last_write) > 1024:
+                cutoff = now - self.window_seconds
+                self._last_write = {k: t for k, t in self._last_write.items() if t >= cutoff}
+
+    def is_sticky(self, identity: str) -> bool:
+        last = self._last_write.get(identity)
+        return last is not None and time.monotonic() - last < self.window_seconds
+
+
+read_your_writes = ReadYourWrites()
+
+
+def request_identity(request: Request) -> Optional[str]:
+    """Usuário do token (sub) ou, sem token, o IP do cliente"""
+    subject = request_claims(request).get("sub")
+    if subject:
+        return f"user:{subject}"
+    host = client_ip(request)
+    return f"ip:{host}" if host else None
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    IP do cliente. Atrás de um proxy confiável (TRUSTED_PROXIES), usa o último
+    endereço do X-Forwarded-For que não é de um proxy confiável.
+    """
+    host = request.client.host if request.client else None
+    if host not in TRUSTED_PROXIES:
+        return host
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in TRUSTED_PROXIES:
+            return hop
+    return hops[0] if hops else host
+
+
+def is_read_request(request: Request) -> bool:
+    return request.method in SAFE_METHODS
@@ -1,6 +1,53 @@
+from fastapi import HTTPException, Request
 from sqlmodel import Session
-from .db import engine
+from .db import engine, get_read_engine
+from .tenancy import is_valid_tenant, resolve_tenant, get_tenant_engine
+from .routing import read_your_writes, request_identity, is_read_request
 
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+def get_session(request: Request):
+    """
+    Session do tenant da requisição (ou da instalação padrão se não houver tenant).
+    Na instalação padrão, leituras vão para uma réplica e escritas para o primário;
+    quem escreveu há pouco continua lendo do primário (read-your-writes).
+    """
+    tenant = resolve_tenant(request)
+    if tenant:
+        with Session(get_tenant_engine(tenant, engine)) as session:
+            yield session
+        return
+
+    identity = request_identity(request)
+    if is_read_request(request):
+        sticky = identity is not None and read_your_writes.is_sticky(identity)
+        bind = engine if sticky else get_read_engine()
+        with Session(bind) as session:
+            yield session
+        return
+
+    # Marca antes do yield: o teardown da dependência só roda depois de a resposta
+    # ter sido enviada, e o cliente pode ler logo em seguida
+    if identity is not None:
+        read_your_writes.mark_write(identity)
+    try:
+        with Session(engine) as session:
+            yield session
+    finally:
+        # Renova a janela a partir do fim da escrita (requisições longas)
+        if identity is not None:
+            read_your_writes.mark_write(identity)
+
+def get_public_session(request: Request):
+    """
+    Session para rotas públicas (cacheáveis em CDN, sem Authorization): o tenant vem
+    só do parâmetro {tenant} do caminho, nunca do token ou do Host, para que a URL
+    identifique sozinha o conteúdo. Sem {tenant}: instalação padrão (réplica de leitura).
+    """
+    tenant = request.path_params.get("tenant")
+    if tenant is None:
+        bind = get_read_engine()
+    elif is_valid_tenant(tenant):
+        bind = get_tenant_engine(tenant, engine)
+    else:
+        raise HTTPException(status_code=404, detail="Unknown tenant")
+    with Session(bind) as session:
+        yield session
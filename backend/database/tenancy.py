@@ -0,0 +1,207 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlmodel import SQLModel, create_engine
+
+from config import (
+    ALGORITHM,
+    SECRET_KEY,
+    TENANT_DATABASE_URL,
+    TENANT_HOST_SUFFIX,
+    TENANT_MAX_ENGINES,
+    TENANT_ROUTING,
+)
+
+# Tenant ids are used in file names / schema names, so keep them strict
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+TENANT_ROUTING_MODES = ("file", "schema")
+# Chave em scope["state"]: o token é decodificado uma vez por requisição
+CLAIMS_STATE_KEY = "token_claims"
+
+
+def is_valid_tenant(tenant: str) -> bool:
+    return bool(TENANT_ID_PATTERN.match(tenant))
+
+
+def request_claims(request: Request) -> dict:
+    """
+    Claims do token Bearer da requisição; {} se ausente ou inválido.
+    O resultado fica em scope["state"], compartilhado por middlewares e dependências.
+    """
+    state = request.scope.setdefault("state", {})
+    claims = state.get(CLAIMS_STATE_KEY)
+    if claims is None:
+        claims = state[CLAIMS_STATE_KEY] = _decode_claims(request)
+    return claims
+
+
+def _decode_claims(request: Request) -> dict:
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return {}
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return {}
+
+
+def resolve_tenant(request: Request) -> Optional[str]:
+    """
+    Descobre o tenant (CMEI) da requisição: claim "tenant" do token JWT ou subdomínio do Host.
+    Num Host de tenant, um token precisa ser desse mesmo tenant (403 caso contrário),
+    para que um token da instalação padrão ou de outro CMEI não valha ali.
+    Retorna None quando a requisição é da instalação padrão (single-tenant).
+    """
+    claims = request_claims(request)
+    tenant = claims.get("tenant")
+    host_tenant = _host_tenant(request)
+    if host_tenant is not None and claims and tenant != host_tenant:
+        raise HTTPException(status_code=403, detail="Token não pertence a este CMEI")
+    tenant = tenant or host_tenant
+    return _checked(tenant) if tenant else None
+
+
+def _host_tenant(request: Request) -> Optional[str]:
+    if not TENANT_HOST_SUFFIX:
+        return None
+    host = request.headers.get("host", "").split(":")[0].lower()
+    suffix = "." + TENANT_HOST_SUFFIX.lower()
+    if host.endswith(suffix):
+        return _checked(host[: -len(suffix)])
+    return None
+
+
+def _checked(tenant: str) -> str:
+    if not is_valid_tenant(tenant):
+        raise HTTPException(status_code=400, detail="Invalid tenant")
+    return tenant
+
+
+def engine_key(engine: Engine) -> str:
+    """Identifica o banco de uma engine; no modo "schema" os tenants compartilham a URL"""
+    schema_map = engine.get_execution_options().get("schema_translate_map") or {}
+    return f"{engine.url}#{schema_map.get(None) or ''}"
+
+
+def tenant_database_url(tenant: str) -> str:
+    return TENANT_DATABASE_URL.format(tenant=tenant)
+
+
+class TenantEngineCache:
+    """
+    LRU limitado de engines por tenant.
+    Engines menos usadas são descartadas (dispose) para não manter
+    conexões abertas de centenas de CMEIs pequenos ao mesmo tempo.
+    """
+
+    def __init__(self, max_engines: int = TENANT_MAX_ENGINES):
+        self.max_engines = max_engines
+        self._engines: "OrderedDict[str, Engine]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Tenants cujas tabelas já foram criadas neste processo (sobrevive ao LRU)
+        self._provisioned = set()
+        self._provision_lock = threading.Lock()
+
+    def get(self, tenant: str) -> Engine:
+        with self._lock:
+            engine = self._engines.get(tenant)
+            if engine is not None:
+                self._engines.move_to_end(tenant)
+                return engine
+
+        # Fora do lock do LRU: abrir/provisionar um tenant não trava os demais
+        engine = self._create_engine(tenant)
+        self._provision(tenant, engine)
+        with self._lock:
+            existing = self._engines.get(tenant)
+            if existing is not None:
+                # Outra requisição abriu o mesmo tenant ao mesmo tempo
+                engine.dispose()
+                self._engines.move_to_end(tenant)
+                return existing
+            self._engines[tenant] = engine
+            while len(self._engines) > self.max_engines:
+                _, evicted = self._engines.popitem(last=False)
+                # Conexões em uso continuam válidas até serem devolvidas ao pool
+                evicted.dispose()
+            return engine
+
+    def _provision(self, tenant: str, engine: Engine):
+        """Cria as tabelas (idempotente) uma vez por tenant, inclusive em bancos antigos"""
+        if tenant in self._provisioned:
+            return
+        with self._provision_lock:
+            if tenant not in self._provisioned:
+                SQLModel.metadata.create_all(engine)
+                self._provisioned.add(tenant)
+
+    def _create_engine(self, tenant: str) -> Engine:
+        url = make_url(tenant_database_url(tenant))
+        if url.get_backend_name() == "sqlite":
+            if url.database and not os.path.exists(url.database):
+                raise HTTPException(status_code=404, detail="Unknown tenant")
+            return create_engine(url, connect_args={"check_same_thread": False})
+        return create_engine(url, pool_size=1, max_overflow=4, pool_recycle=300)
+
+    def clear(self):
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+            self._provisioned.clear()
+
+    def __contains__(self, tenant: str) -> bool:
+        return tenant in self._engines
+
+    def __len__(self) -> int:
+        return len(self._engines)
+
+
+tenant_engines = TenantEngineCache()
+
+
+_known_schemas = set()
+_schemas_lock = threading.Lock()
+
+
+def check_tenant_routing(default_engine: Engine):
+    """Valida TENANT_ROUTING no startup (schemas não existem no SQLite)"""
+    if TENANT_ROUTING not in TENANT_ROUTING_MODES:
+        raise RuntimeError(f"TENANT_ROUTING inválido: {TENANT_ROUTING!r} (use 'file' ou 'schema')")
+    if TENANT_ROUTING == "schema" and default_engine.dialect.name == "sqlite":
+        raise RuntimeError("TENANT_ROUTING=schema exige um banco com schemas (ex.: PostgreSQL), não SQLite")
+
+
+def get_tenant_engine(tenant: str, default_engine: Engine) -> Engine:
+    """Retorna a engine do tenant conforme TENANT_ROUTING ("file" ou "schema")"""
+    if TENANT_ROUTING == "schema":
+        # Uma única engine compartilhada; o schema do tenant é aplicado por conexão
+        engine = default_engine.execution_options(schema_translate_map={None: tenant})
+        if tenant not in _known_schemas:
+            with _schemas_lock:
+                if tenant not in _known_schemas:
+                    if not inspect(default_engine).has_schema(tenant):
+                        raise HTTPException(status_code=404, detail="Unknown tenant")
+                    SQLModel.metadata.create_all(engine)
+                    _known_schemas.add(tenant)
+        return engine
+    return tenant_engines.get(tenant)
+
+
+def create_tenant_db(tenant: str) -> Engine:
+    """Provisiona o banco de um novo tenant (arquivo SQLite) com todas as tabelas"""
+    tenant = _checked(tenant)
+    url = make_url(tenant_database_url(tenant))
+    if url.get_backend_name() == "sqlite" and url.database:
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+        open(url.database, "a").close()
+    # As tabelas são criadas quando a engine do tenant é aberta
+    return tenant_engines.get(tenant)
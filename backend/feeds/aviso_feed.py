@@ -0,0 +1,227 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, inspect, or_
+from sqlmodel import Session, select
+
+from config import AVISO_INBOX_ENABLED, MEMBERSHIP_CACHE_SECONDS
+from database.tenancy import engine_key
+from models.aviso import Aviso
+from models.aviso_inbox import AvisoInbox
+from models.user import Child, ChildParentLink, User
+
+
+class MembershipCache:
+    """
+    Cache responsável -> turmas dos filhos (User -> ChildParentLink -> Child.classroom).
+    Evita refazer o join a cada polling do feed.
+    """
+
+    def __init__(self, ttl_seconds: float = MEMBERSHIP_CACHE_SECONDS, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, FrozenSet[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def classrooms(self, session: Session, parent_id: int) -> FrozenSet[str]:
+        # Por banco (e schema, no modo "schema"): ids de usuário se repetem entre tenants
+        key = (engine_key(session.get_bind()), parent_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        statement = (
+            select(Child.classroom)
+            .join(ChildParentLink, ChildParentLink.child_id == Child.id)
+            .where(ChildParentLink.parent_id == parent_id)
+            .distinct()
+        )
+        classrooms = frozenset(session.exec(statement).all())
+        with self._lock:
+            self._entries[key] = (now, classrooms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return classrooms
+
+    def invalidate(self, parent_id: Optional[int] = None):
+        """Chamar quando vínculos responsável/criança ou turmas mudarem"""
+        with self._lock:
+            if parent_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[1] == parent_id]:
+                    del self._entries[key]
+
+
+membership_cache = MembershipCache()
+
+
+def recipients(session: Session, aviso: Aviso) -> Set[int]:
+    """
+    Usuários que podem ver o aviso: todos, se target_classroom for None (como no modo
+    sem caixa de entrada), senão os responsáveis por crianças da turma.
+    """
+    if aviso.target_classroom is None:
+        statement = select(User.id)
+    else:
+        statement = (
+            select(ChildParentLink.parent_id)
+            .join(Child, Child.id == ChildParentLink.child_id)
+            .where(Child.classroom == aviso.target_classroom)
+            .distinct()
+        )
+    return set(session.exec(statement).all())
+
+
+def deliver(session: Session, aviso: Aviso):
+    """
+    Alimenta as caixas de entrada do aviso (idempotente: também serve após
+    mudança de target_classroom). Não faz commit.
+    """
+    if not AVISO_INBOX_ENABLED:
+        return
+    wanted = recipients(session, aviso)
+    existing = {row.user_id: row for row in session.exec(select(AvisoInbox).where(AvisoInbox.aviso_id == aviso.id)).all()}
+    for user_id in wanted - existing.keys():
+        session.add(AvisoInbox(user_id=user_id, aviso_id=aviso.id))
+    for user_id in existing.keys() - wanted:
+        session.delete(existing[user_id])
+
+
+def redeliver_parent(session: Session, parent_id: int):
+    """
+    Refaz a caixa de entrada de um usuário (novo cadastro, vínculo criado/removido
+    ou filho trocado de turma). Não faz commit.
+    """
+    membership_cache.invalidate(parent_id)
+    if not AVISO_INBOX_ENABLED:
+        return
+    classrooms = session.exec(
+        select(Child.classroom)
+        .join(ChildParentLink, ChildParentLink.child_id == Child.id)
+        .where(ChildParentLink.parent_id == parent_id)
+        .distinct()
+    ).all()
+    condition = or_(Aviso.target_classroom.is_(None), Aviso.target_classroom.in_(classrooms))
+    wanted = set(session.exec(select(Aviso.id).where(condition)).all())
+    existing = {row.aviso_id: row for row in session.exec(select(AvisoInbox).where(AvisoInbox.user_id == parent_id)).all()}
+    for aviso_id in wanted - existing.keys():
+        session.add(AvisoInbox(user_id=parent_id, aviso_id=aviso_id))
+    for aviso_id in existing.keys() - wanted:
+        session.delete(existing[aviso_id])
+
+
+def backfill(session: Session) -> int:
+    """Entrega todos os avisos existentes (idempotente). Não faz commit. Retorna o nº de avisos"""
+    if not AVISO_INBOX_ENABLED:
+        return 0
+    avisos = session.exec(select(Aviso)).all()
+    for aviso in avisos:
+        deliver(session, aviso)
+    return len(avisos)
+
+
+_CHANGED_PARENTS = "aviso_feed_parents"
+_CHANGED_CHILDREN = "aviso_feed_children"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_membership_changes(session, flush_context):
+    """Anota responsáveis cujo conjunto de turmas pode ter mudado neste flush"""
+    parents = session.info.setdefault(_CHANGED_PARENTS, set())
+    children = session.info.setdefault(_CHANGED_CHILDREN, set())
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, ChildParentLink):
+            parents.add(obj.parent_id)
+        elif isinstance(obj, User) and obj in session.new:
+            parents.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Child) and inspect(obj).attrs.classroom.history.has_changes():
+            children.add(obj.id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _redeliver_changed_memberships(session, flush_context):
+    parents = session.info.pop(_CHANGED_PARENTS, set())
+    children = session.info.pop(_CHANGED_CHILDREN, set())
+    if not parents and not children:
+        return
+    # As linhas adicionadas aqui são gravadas no próximo flush (o commit repete o flush)
+    with session.no_autoflush:
+        if children:
+            parents |= set(session.execute(
+                select(ChildParentLink.parent_id).where(ChildParentLink.child_id.in_(children))
+            ).scalars().all())
+        for parent_id in parents:
+            if parent_id is not None:
+                redeliver_parent(session, parent_id)
+
+
+def remove(session: Session, aviso_id: int):
+    for row in session.exec(select(AvisoInbox).where(AvisoInbox.aviso_id == aviso_id)).all():
+        session.delete(row)
+
+
+def _visible_condition(session: Session, user_id: int):
+    classrooms = membership_cache.classrooms(session, user_id)
+    return or_(Aviso.target_classroom.is_(None), Aviso.target_classroom.in_(classrooms))
+
+
+def feed(session: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Tuple[Aviso, Optional[int]]]:
+    """Avisos visíveis para o responsável, mais recentes primeiro: [(aviso, read_at)]"""
+    if AVISO_INBOX_ENABLED:
+        statement = (
+            select(Aviso, AvisoInbox.read_at)
+            .join(AvisoInbox, AvisoInbox.aviso_id == Aviso.id)
+            .where(AvisoInbox.user_id == user_id)
+        )
+    else:
+        statement = (
+            select(Aviso, AvisoInbox.read_at)
+            .outerjoin(AvisoInbox, (AvisoInbox.aviso_id == Aviso.id) & (AvisoInbox.user_id == user_id))
+            .where(_visible_condition(session, user_id))
+        )
+    statement = statement.order_by(Aviso.id.desc()).offset(skip).limit(limit)
+    return session.exec(statement).all()
+
+
+def unread_count(session: Session, user_id: int) -> int:
+    if AVISO_INBOX_ENABLED:
+        statement = select(func.count()).select_from(AvisoInbox).where(
+            AvisoInbox.user_id == user_id, AvisoInbox.read_at.is_(None)
+        )
+        return session.exec(statement).one()
+
+    # Sem caixa de entrada materializada, AvisoInbox guarda só as confirmações de leitura
+    visible = session.exec(select(func.count()).select_from(Aviso).where(_visible_condition(session, user_id))).one()
+    read = session.exec(
+        select(func.count()).select_from(AvisoInbox).join(Aviso, Aviso.id == AvisoInbox.aviso_id).where(
+            AvisoInbox.user_id == user_id, AvisoInbox.read_at.is_not(None), _visible_condition(session, user_id)
+        )
+    ).one()
+    return visible - read
+
+
+def mark_read(session: Session, user_id: int, aviso_id: int) -> bool:
+    """Confirmação de leitura. Retorna False se o aviso não é visível para o usuário. Não faz commit."""
+    row = session.get(AvisoInbox, (user_id, aviso_id))
+    if row is None:
+        if AVISO_INBOX_ENABLED:
+            return False
+        aviso = session.get(Aviso, aviso_id)
+        if aviso is None or (
+            aviso.target_classroom is not None
+            and aviso.target_classroom not in membership_cache.classrooms(session, user_id)
+        ):
+            return False
+        row = AvisoInbox(user_id=user_id, aviso_id=aviso_id)
+    if row.read_at is None:
+        row.read_at = int(time.time())
+        session.add(row)
+    return True
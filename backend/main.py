@@ -1,8 +1,16 @@
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
-from routes import token_routes, aviso_routes, rotina_routes, saude_routes, calendario_routes, user_routes
+from routes import token_routes, aviso_routes, rotina_routes, saude_routes, calendario_routes, user_routes, anexo_routes, presenca_routes, cardapio_routes
 from database.db import create_db_and_tables, get_engine
+from database.tenancy import check_tenant_routing
 from create_test_user import create_test_user
+from middleware.admission import AdmissionControlMiddleware, admission_metrics
+from middleware.idempotency import IdempotencyMiddleware
+from middleware.profiling import ProfilingMiddleware
+from routes import profiling_routes
+from config import ADMISSION_ENABLED, PROFILING_ENABLED
+from storage.attachments import shutdown_thumbnail_pool
+from attendance.log import attendance
 from sqlmodel import select, SQLModel, Session, text
 import datetime
 import platform
@@ -10,6 +18,19 @@ import os
 
 app = FastAPI(title="CMEI App API")
 
+# Controle de admissão (rate limit + limite de concorrência).
+# Adicionado antes do CORS para que respostas 429/503 também levem os headers CORS.
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Idempotency-Key: repetições de escrita do app (rede instável) não criam duplicados.
+# Fica por fora do controle de admissão para que repetições não consumam o limite.
+app.add_middleware(IdempotencyMiddleware)
+
+# Profiling sob demanda: desligado por padrão, sem custo nenhum por requisição
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Configurar CORS para permitir requisições do frontend
 app.add_middleware(
     CORSMiddleware,
@@ -21,12 +42,20 @@ app.add_middleware(
 
 @app.on_event("startup")
 def on_startup():
+    check_tenant_routing(get_engine())
     create_db_and_tables()
     # Criar usuário de teste automaticamente
     try:
         create_test_user()
     except Exception as e:
         print(f"Falha ao criar usuário de teste: {e}")
+    # Presença: reconstrói "quem está presente" a partir do log e inicia o flusher
+    attendance.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_thumbnail_pool()
+    attendance.stop()
 
 # Adicionar rota de health check para monitoramento da API
 @app.get("/health")
@@ -43,7 +72,8 @@ def health_check():
             "python_version": platform.python_version(),
             "system": platform.system(),
             "machine": platform.machine()
-        }
+        },
+        "admission": admission_metrics.snapshot()
     }
     
     try:
@@ -119,3 +149,8 @@ app.include_router(rotina_routes.router)
 app.include_router(saude_routes.router)
 app.include_router(calendario_routes.router)
 app.include_router(token_routes.router)
+app.include_router(anexo_routes.router)
+app.include_router(presenca_routes.router)
+app.include_router(cardapio_routes.router)
+if PROFILING_ENABLED:
+    app.include_router(profiling_routes.router)
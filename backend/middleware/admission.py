@@ -0,0 +1,197 @@
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from config import (
+    ADMISSION_ANONYMOUS_BURST,
+    ADMISSION_ANONYMOUS_RATE,
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_ROUTE_BURST,
+    ADMISSION_ROUTE_RATE,
+    ADMISSION_USER_BURST,
+    ADMISSION_USER_RATE,
+)
+from database.routing import SAFE_METHODS, request_identity
+from database.tenancy import request_claims
+from middleware.idempotency import REJECTED_BEFORE_HANDLER
+
+# Prioridade fixa: 0 = escrita de professores/admin, 1 = demais escritas e
+# leituras da equipe, 2 = leituras (polling) de pais e anônimos.
+# Cada classe só pode ocupar essa fração das vagas de concorrência, então
+# sob carga o polling dos pais é descartado antes das escritas dos professores.
+PRIORITY_SHARE = {0: 1.0, 1: 0.85, 2: 0.6}
+STAFF_ROLES = {"teacher", "admin"}
+
+# Rotas que nunca passam pelo controle de admissão
+EXEMPT_PATHS = {"/health", "/docs", "/openapi.json"}
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+# Rótulo para caminhos/métodos fora das rotas da aplicação (mantém métricas e buckets limitados)
+OTHER_ROUTE = "other"
+
+
+class InMemoryBucketBackend:
+    """
+    Estado dos token buckets em memória do processo.
+    Para vários workers, use um backend compartilhado (ex.: Redis) com o
+    mesmo método take().
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> Tuple[bool, float]:
+        """Consome 1 token. Retorna (permitido, segundos até haver token)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after
+
+
+class AdmissionMetrics:
+    def __init__(self):
+        self.admitted = 0
+        self.shed: Dict[str, int] = defaultdict(int)
+
+    def record_shed(self, reason: str, route: str):
+        self.shed[f"{reason}:{route}"] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "shed_total": sum(self.shed.values()),
+            "shed": dict(self.shed),
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI de controle de admissão:
+    - token bucket por usuário (ou por IP, sem token) e por rota (429 + Retry-After)
+    - limite global de concorrência com prioridade (503 + Retry-After)
+    """
+
+    def __init__(
+        self,
+        app,
+        backend=None,
+        metrics: AdmissionMetrics = None,
+        user_rate: float = ADMISSION_USER_RATE,
+        user_burst: float = ADMISSION_USER_BURST,
+        anonymous_rate: float = ADMISSION_ANONYMOUS_RATE,
+        anonymous_burst: float = ADMISSION_ANONYMOUS_BURST,
+        route_rate: float = ADMISSION_ROUTE_RATE,
+        route_burst: float = ADMISSION_ROUTE_BURST,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+    ):
+        self.app = app
+        self.backend = backend or InMemoryBucketBackend()
+        self.metrics = metrics or admission_metrics
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.anonymous_rate = anonymous_rate
+        self.anonymous_burst = anonymous_burst
+        self.route_rate = route_rate
+        self.route_burst = route_burst
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._segments = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        if self._segments is None:
+            self._segments = route_segments(scope.get("app"))
+        route = route_key(request, self._segments)
+        priority = request_priority(request)
+
+        identity = request_identity(request)
+        if identity is not None:
+            if identity.startswith("ip:"):
+                # Login, refresh e snapshots públicos: limite próprio, maior que o de um usuário
+                rate, burst, reason = self.anonymous_rate, self.anonymous_burst, "anonymous_rate"
+            else:
+                rate, burst, reason = self.user_rate, self.user_burst, "user_rate"
+            allowed, retry_after = self.backend.take(f"user:{identity}", rate, burst)
+            if not allowed:
+                await self._shed(scope, receive, send, 429, reason, route, retry_after)
+                return
+
+        allowed, retry_after = self.backend.take(f"route:{route}", self.route_rate, self.route_burst)
+        if not allowed:
+            await self._shed(scope, receive, send, 429, "route_rate", route, retry_after)
+            return
+
+        # Um único event loop: o contador não precisa de lock
+        if self.in_flight >= self.max_concurrency * PRIORITY_SHARE[priority]:
+            await self._shed(scope, receive, send, 503, f"overload_p{priority}", route, 1)
+            return
+
+        self.in_flight += 1
+        self.metrics.admitted += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _shed(self, scope, receive, send, status_code, reason, route, retry_after):
+        self.metrics.record_shed(reason, route)
+        # Não é resposta do handler: o middleware de idempotência não deve guardá-la
+        scope.setdefault("state", {})[REJECTED_BEFORE_HANDLER] = True
+        response = JSONResponse(
+            {"detail": "Too many requests" if status_code == 429 else "Service overloaded"},
+            status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
+
+
+def route_segments(app) -> Optional[Set[str]]:
+    """Primeiros segmentos das rotas registradas (ex.: {"avisos", "token"}); None se desconhecidos"""
+    routes = getattr(app, "routes", None)
+    if routes is None:
+        return None
+    return {route.path.strip("/").split("/")[0] for route in routes if hasattr(route, "path")}
+
+
+def route_key(request: Request, segments: Optional[Set[str]] = None) -> str:
+    """
+    Método + primeiro segmento do caminho (ex.: "GET /avisos").
+    Caminhos e métodos fora da aplicação viram "other", para que clientes
+    não criem rótulos (e buckets) novos à vontade.
+    """
+    method = request.method if request.method in KNOWN_METHODS else OTHER_ROUTE.upper()
+    segment = request.url.path.strip("/").split("/")[0]
+    if segments is not None and segment not in segments:
+        segment = OTHER_ROUTE
+    return f"{method} /{segment}"
+
+
+def request_priority(request: Request) -> int:
+    is_write = request.method not in SAFE_METHODS
+    is_staff = request_claims(request).get("role") in STAFF_ROLES
+    if is_write and is_staff:
+        return 0
+    if is_write or is_staff:
+        return 1
+    return 2
+
+
+admission_metrics = AdmissionMetrics()
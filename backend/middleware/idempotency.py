@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from config import IDEMPOTENCY_MAX_BODY_BYTES, IDEMPOTENCY_TTL_SECONDS
+from database.routing import SAFE_METHODS, request_identity
+from database.tenancy import resolve_tenant
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+# Marcado em scope["state"] por middlewares que rejeitam a requisição antes do handler
+REJECTED_BEFORE_HANDLER = "rejected_before_handler"
+TRANSIENT_STATUS = {408, 409, 429}
+BODY_SPOOL_BYTES = 1024 * 1024
+BODY_CHUNK_BYTES = 64 * 1024
+
+
+def _size(body_file) -> int:
+    position = body_file.tell()
+    body_file.seek(0, 2)
+    end = body_file.tell()
+    body_file.seek(position)
+    return end
+
+# (fingerprint, status, headers, body)
+StoredResponse = Tuple[str, int, list, bytes]
+
+
+class InMemoryIdempotencyStore:
+    """
+    Respostas já enviadas por chave de idempotência, com TTL.
+    Para vários workers, use um backend compartilhado (ex.: Redis) com os
+    mesmos métodos get()/set().
+    """
+
+    def __init__(self, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, StoredResponse]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def set(self, key: str, response: StoredResponse):
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI para o header Idempotency-Key em escritas (POST/PUT/PATCH/DELETE).
+    - repetição com a mesma chave: devolve a resposta guardada sem executar de novo
+    - requisições simultâneas com a mesma chave: só uma executa, as outras esperam
+    - mesma chave com outro corpo/rota: 422
+    Respostas 5xx, 408/409/429 e rejeições antes do handler (ex.: controle de
+    admissão) não são guardadas, para que o cliente possa tentar de novo.
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or InMemoryIdempotencyStore()
+        self._in_flight: Dict[str, asyncio.Event] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            tenant = resolve_tenant(request)
+        except HTTPException:
+            # Tenant inválido/token de outro CMEI: o app responde o erro, nada é guardado
+            await self.app(scope, receive, send)
+            return
+        # Usuários de mesmo nome em CMEIs diferentes não compartilham chaves
+        key = f"{tenant or ''}:{request_identity(request)}:{idempotency_key}"
+        # Lê o corpo inteiro antes de chamar o app: a impressão digital não pode
+        # depender de o handler (ou um middleware que rejeitou antes) ter lido o corpo
+        body_file, fingerprint = await self._read_body(scope, receive)
+        try:
+            while True:
+                stored = self.store.get(key)
+                if stored is not None:
+                    await self._replay(stored, fingerprint, scope, receive, send)
+                    return
+                event = self._in_flight.get(key)
+                if event is None:
+                    break
+                # Outra requisição com a mesma chave está executando: espera o resultado
+                await event.wait()
+
+            event = self._in_flight[key] = asyncio.Event()
+            try:
+                await self._execute(key, fingerprint, body_file, scope, receive, send)
+            finally:
+                del self._in_flight[key]
+                event.set()
+        finally:
+            body_file.close()
+
+    async def _read_body(self, scope, receive):
+        """Corpo em arquivo temporário (em memória até 1 MB) + hash de método, caminho e corpo"""
+        digest = hashlib.sha256(f"{scope['method']} {scope['path']}\n".encode())
+        body_file = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_BYTES)
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            digest.update(chunk)
+            body_file.write(chunk)
+            more_body = message.get("more_body", False)
+        body_file.seek(0)
+        return body_file, digest.hexdigest()
+
+    async def _execute(self, key, fingerprint, body_file, scope, receive, send):
+        status_code = None
+        headers = []
+        body = []
+        size = 0
+        body_sent = False
+        total = _size(body_file)
+
+        async def replay_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            chunk = body_file.read(BODY_CHUNK_BYTES)
+            more_body = body_file.tell() < total
+            body_sent = not more_body
+            return {"type": "http.request", "body": chunk, "more_body": more_body}
+
+        async def capturing_send(message):
+            nonlocal status_code, headers, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and size <= IDEMPOTENCY_MAX_BODY_BYTES:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                body.append(chunk)
+            await send(message)
+
+        await self.app(scope, replay_receive, capturing_send)
+
+        # Só guarda respostas do handler: rejeições transitórias (rate limit,
+        # sobrecarga, timeout, conflito) devem deixar o cliente tentar de novo
+        shed = scope.get("state", {}).get(REJECTED_BEFORE_HANDLER, False)
+        if (
+            status_code is not None
+            and status_code < 500
+            and status_code not in TRANSIENT_STATUS
+            and not shed
+            and size <= IDEMPOTENCY_MAX_BODY_BYTES
+        ):
+            self.store.set(key, (fingerprint, status_code, headers, b"".join(body)))
+
+    async def _replay(self, stored: StoredResponse, fingerprint, scope, receive, send):
+        stored_fingerprint, status_code, headers, body = stored
+        if fingerprint != stored_fingerprint:
+            response = JSONResponse(
+                {"detail": "Idempotency-Key já usada com outra requisição"}, status_code=422
+            )
+            await response(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,208 @@
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from config import PROFILING_INTERVAL_SECONDS
+
+# Frames no topo da pilha que indicam thread ociosa (esperando trabalho / IO)
+IDLE_FUNCTIONS = {"wait", "select", "poll", "epoll", "_worker", "get", "accept", "sleep"}
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+
+
+def endpoint_codes(app) -> Dict[object, str]:
+    """code object do endpoint -> caminho da rota, para atribuir amostras a rotas"""
+    codes = {}
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        code = getattr(endpoint, "__code__", None)
+        if code is not None:
+            codes[code] = route.path
+    return codes
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class Sampler:
+    """
+    Profiler estatístico: uma thread lê sys._current_frames() a cada intervalo
+    e acumula pilhas no formato "collapsed" (compatível com flamegraph.pl / speedscope).
+    Amostras de threads ociosas são descartadas; as demais são atribuídas à rota
+    cujo endpoint aparece na pilha.
+    """
+
+    def __init__(self, codes: Dict[object, str], interval: float = PROFILING_INTERVAL_SECONDS,
+                 route_prefix: Optional[str] = None):
+        self.codes = codes
+        self.interval = interval
+        self.route_prefix = route_prefix
+        self.stacks: Dict[str, int] = defaultdict(int)
+        self.route_samples: Dict[str, int] = defaultdict(int)
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Inicia (ou retoma) a amostragem; as amostras anteriores são mantidas"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cmei-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.sample(frame)
+
+    def sample(self, frame):
+        code = frame.f_code
+        if code.co_name in IDLE_FUNCTIONS and code.co_filename.endswith(IDLE_FILES):
+            return
+        labels = []
+        route = None
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            if route is None:
+                route = self.codes.get(frame.f_code)
+            frame = frame.f_back
+        route = route or "<other>"
+        if self.route_prefix is not None and not route.startswith(self.route_prefix):
+            return
+        labels.reverse()
+        self.stacks[";".join(labels)] += 1
+        self.route_samples[route] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.stacks.items()))
+
+    def summary(self) -> dict:
+        return {
+            route: {"samples": count, "cpu_ms_estimate": round(count * self.interval * 1000, 1)}
+            for route, count in sorted(self.route_samples.items(), key=lambda item: -item[1])
+        }
+
+
+class ProfilerState:
+    """Estado global do profiling sob demanda (nada roda enquanto não for armado)"""
+
+    def __init__(self):
+        self.sampler: Optional[Sampler] = None
+        self.mode: Optional[str] = None
+        # Modo "requests": próximas N requisições que casam com route_prefix
+        self.remaining = 0
+        self.route_prefix: Optional[str] = None
+        self.in_flight = 0
+        # Incrementado a cada reset: requisições de uma sessão anterior são ignoradas ao terminar
+        self.generation = 0
+        self.requests: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def arm_requests(self, codes, route_prefix: str, count: int):
+        self.reset()
+        self.mode = "requests"
+        self.route_prefix = route_prefix
+        self.sampler = Sampler(codes, route_prefix=route_prefix)
+        self.remaining = count
+
+    def start_window(self, codes, seconds: float):
+        self.reset()
+        self.mode = "window"
+        self.sampler = Sampler(codes)
+        self.sampler.start()
+        timer = threading.Timer(seconds, self.sampler.stop)
+        timer.daemon = True
+        timer.start()
+
+    def reset(self):
+        with self._lock:
+            sampler = self.sampler
+            self.generation += 1
+            self.sampler = None
+            self.mode = None
+            self.remaining = 0
+            self.route_prefix = None
+            self.in_flight = 0
+            self.requests = {}
+        if sampler is not None:
+            sampler.stop()
+
+    # Usado pelo middleware no modo "requests"
+    def begin_request(self, path: str) -> Optional[int]:
+        """Retorna a geração do profiling se a requisição deve ser perfilada, senão None"""
+        with self._lock:
+            if self.remaining <= 0 or self.sampler is None or not path.startswith(self.route_prefix):
+                return None
+            self.remaining -= 1
+            self.in_flight += 1
+            # Amostra só enquanto houver requisição perfilada em andamento
+            self.sampler.start()
+            return self.generation
+
+    def end_request(self, generation: int, path: str, wall: float, cpu: float):
+        with self._lock:
+            if generation != self.generation:
+                return
+            stats = self.requests.setdefault(path, {"count": 0, "wall_ms": 0.0, "process_cpu_ms": 0.0})
+            stats["count"] += 1
+            stats["wall_ms"] += wall * 1000
+            stats["process_cpu_ms"] += cpu * 1000
+            self.in_flight -= 1
+            if self.in_flight == 0 and self.sampler is not None:
+                self.sampler.stop()
+
+    def results(self) -> dict:
+        sampler = self.sampler
+        return {
+            "mode": self.mode,
+            "running": bool(sampler and sampler.running),
+            "remaining_requests": self.remaining,
+            "samples": sampler.samples if sampler else 0,
+            "routes": sampler.summary() if sampler else {},
+            "requests": {
+                path: {**stats, "wall_ms": round(stats["wall_ms"], 1), "process_cpu_ms": round(stats["process_cpu_ms"], 1)}
+                for path, stats in self.requests.items()
+            },
+        }
+
+
+profiler = ProfilerState()
+
+
+class ProfilingMiddleware:
+    """Só registrado com PROFILING_ENABLED; sem profiling armado custa uma comparação"""
+
+    def __init__(self, app, state: ProfilerState = profiler):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        generation = None
+        if scope["type"] == "http" and self.state.remaining > 0:
+            generation = self.state.begin_request(scope["path"])
+        if generation is None:
+            await self.app(scope, receive, send)
+            return
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.state.end_request(generation, scope["path"], time.perf_counter() - wall_start, time.process_time() - cpu_start)
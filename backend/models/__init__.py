@@ -1,5 +1,10 @@
 from .aviso import Aviso
 from .user import User, Child, ChildParentLink
 from .rotina import Rotina
-from .saude import SaudeRecord
-from .calendario import CalendarioEvento
\ No newline at end of file
+from .saude import SaudeRecord, SaudeRollup, SaudeFeverDay
+from .calendario import CalendarioEvento
+from .anexo import Anexo
+from .refresh_token import RefreshToken
+from .aviso_inbox import AvisoInbox
+from .presenca import PresencaEvento
+from .cardapio import CardapioSemana
\ No newline at end of file
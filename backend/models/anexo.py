@@ -0,0 +1,20 @@
+from sqlmodel import SQLModel, Field, Relationship
+from typing import Optional, TYPE_CHECKING
+from datetime import datetime, timezone
+
+if TYPE_CHECKING:
+    from .aviso import Aviso
+
+class Anexo(SQLModel, table=True):
+    """Arquivo (foto) anexado a um aviso ou rotina; o conteúdo fica no ContentStore"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    sha256: str = Field(index=True)
+    filename: str
+    content_type: str
+    size: int
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    aviso_id: Optional[int] = Field(default=None, foreign_key="aviso.id", index=True)
+    rotina_id: Optional[int] = Field(default=None, foreign_key="rotina.id", index=True)
+
+    # Relationships
+    aviso: Optional["Aviso"] = Relationship(back_populates="anexos")
@@ -1,11 +1,15 @@
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 
 if TYPE_CHECKING:
     from .user import User
+    from .anexo import Anexo
 
 class Aviso(SQLModel, table=True):
+    # Each tenant has its own tables (file or schema), so indexes are tenant-scoped
+    __table_args__ = (Index("ix_aviso_target_classroom_created_at", "target_classroom", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
@@ -17,4 +21,5 @@ class Aviso(SQLModel, table=True):
     target_classroom: Optional[str] = None  # If None, for all classrooms
     
     # Relationships
-    author: "User" = Relationship(back_populates="avisos")
\ No newline at end of file
+    author: "User" = Relationship(back_populates="avisos")
+    anexos: List["Anexo"] = Relationship(back_populates="aviso")
\ No newline at end of file
@@ -0,0 +1,13 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import Optional
+
+class AvisoInbox(SQLModel, table=True):
+    """
+    Caixa de entrada materializada: uma linha por (responsável, aviso visível).
+    O feed de um responsável vira uma única busca indexada por user_id.
+    """
+    __table_args__ = (Index("ix_avisoinbox_user_id_read_at", "user_id", "read_at"),)
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    aviso_id: int = Field(foreign_key="aviso.id", primary_key=True, index=True)
+    read_at: Optional[int] = None  # Unix timestamp da confirmação de leitura
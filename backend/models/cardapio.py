@@ -0,0 +1,27 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import List, Optional
+from datetime import date
+
+class CardapioSemana(SQLModel, table=True):
+    """
+    Versão publicada (imutável) do cardápio de uma semana.
+    O JSON é gerado uma única vez na publicação, já comprimido.
+    """
+    __table_args__ = (Index("ix_cardapiosemana_week_start_version", "week_start", "version", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    week_start: date  # segunda-feira
+    version: int
+    content_hash: str = Field(unique=True, index=True)
+    published_at: int  # Unix timestamp
+    payload: bytes  # JSON pronto
+    payload_gzip: bytes
+
+class CardapioItem(SQLModel):
+    dia: date
+    refeicao: str  # ex.: "cafe", "almoco", "lanche", "jantar"
+    descricao: str
+
+class CardapioInput(SQLModel):
+    week_start: date  # qualquer dia da semana; normalizado para a segunda-feira
+    itens: List[CardapioItem]
@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from enum import Enum
+
+class PresencaTipo(str, Enum):
+    CHECK_IN = "check_in"
+    CHECK_OUT = "check_out"
+
+class PresencaEvento(SQLModel, table=True):
+    """Log append-only de entradas/saídas (nunca atualizado ou apagado)"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    child_id: int = Field(foreign_key="child.id", index=True)
+    classroom: str  # turma no momento do evento
+    tipo: PresencaTipo
+    occurred_at: float = Field(index=True)  # Unix timestamp
@@ -0,0 +1,18 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+class RefreshToken(SQLModel, table=True):
+    """
+    Refresh token rotativo. Só o hash SHA-256 é guardado.
+    Tokens de uma mesma sessão de login compartilham family_id;
+    reutilizar um token já rotacionado revoga a família inteira.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    token_hash: str = Field(unique=True, index=True)
+    family_id: str = Field(index=True)
+    subject: str  # "sub" do access token
+    role: Optional[str] = None
+    # Unix timestamps (como o "exp" do JWT)
+    expires_at: int
+    rotated: bool = False
+    revoked_at: Optional[int] = Field(default=None, index=True)
@@ -1,4 +1,4 @@
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 
@@ -6,6 +6,8 @@ if TYPE_CHECKING:
     from .user import Child
 
 class Rotina(SQLModel, table=True):
+    __table_args__ = (Index("ix_rotina_child_id_date", "child_id", "date"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     date: datetime = Field(default_factory=datetime.now)
     child_id: int = Field(foreign_key="child.id")
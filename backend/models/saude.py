@@ -1,11 +1,13 @@
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index
 from typing import Optional, TYPE_CHECKING
-from datetime import datetime
+from datetime import date, datetime
 
 if TYPE_CHECKING:
     from .user import Child
 
 class SaudeRecord(SQLModel, table=True):
+    __table_args__ = (Index("ix_saude_child_id_date", "child_id", "date"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     date: datetime = Field(default_factory=datetime.now)
     child_id: int = Field(foreign_key="child.id")
@@ -15,4 +17,22 @@ class SaudeRecord(SQLModel, table=True):
     temperatura: Optional[float] = None
     
     # Relationships
-    child: "Child" = Relationship(back_populates="saude_records")
\ No newline at end of file
+    child: "Child" = Relationship(back_populates="saude_records")
+
+class SaudeRollup(SQLModel, table=True):
+    """Resumo diário de saúde por turma, atualizado a cada SaudeRecord (ver analytics.saude)"""
+    __table_args__ = (Index("ix_sauderollup_classroom_day", "classroom", "day", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    classroom: str
+    day: date = Field(index=True)
+    count: int = 0  # registros de saúde no dia
+    temp_count: int = 0  # registros com temperatura
+    temp_sum: float = 0.0  # para a média: temp_sum / temp_count
+    temp_max: Optional[float] = None
+    fever_count: int = 0  # crianças distintas acima de FEVER_THRESHOLD
+
+class SaudeFeverDay(SQLModel, table=True):
+    """(criança, dia) com febre: a chave primária garante que cada criança conte uma vez por dia"""
+    child_id: int = Field(foreign_key="child.id", primary_key=True)
+    day: date = Field(primary_key=True)
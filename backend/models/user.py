@@ -30,7 +30,7 @@ class Child(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     birth_date: datetime
-    classroom: str
+    classroom: str = Field(index=True)
       # Relationships
     parents: List["ChildParentLink"] = Relationship(back_populates="child")
     rotinas: List["Rotina"] = Relationship(back_populates="child")
@@ -0,0 +1,101 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from auth import decode_access_token
+from config import ATTACHMENT_MAX_BYTES, THUMBNAIL_SIZES
+from database.session import get_session
+from models.anexo import Anexo
+from storage.attachments import AttachmentTooLarge, content_store, ensure_thumbnails, schedule_thumbnails
+
+router = APIRouter(prefix="/anexos", tags=["Anexos"])
+
+# Conteúdo endereçado por hash nunca muda: pode ficar em cache "para sempre"
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+
+def _save(session: Session, anexo: Anexo) -> Anexo:
+    session.add(anexo)
+    session.commit()
+    session.refresh(anexo)
+    return anexo
+
+@router.post("/", response_model=Anexo)
+async def upload_anexo(
+    request: Request,
+    filename: str,
+    aviso_id: Optional[int] = None,
+    rotina_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+    user_data=Depends(decode_access_token)
+):
+    """
+    Upload em streaming: o corpo da requisição é o próprio arquivo
+    (Content-Type do arquivo, ex.: image/jpeg), gravado em pedaços no disco.
+    """
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    try:
+        sha256, size = await content_store.save_stream(request.stream(), ATTACHMENT_MAX_BYTES)
+    except AttachmentTooLarge:
+        raise HTTPException(status_code=413, detail="Arquivo muito grande")
+
+    anexo = Anexo(
+        sha256=sha256,
+        filename=os.path.basename(filename),
+        content_type=content_type,
+        size=size,
+        aviso_id=aviso_id,
+        rotina_id=rotina_id,
+    )
+    anexo = await run_in_threadpool(_save, session, anexo)
+
+    if content_type.startswith("image/"):
+        schedule_thumbnails(sha256, content_store)
+    return anexo
+
+@router.get("/", response_model=List[Anexo])
+def listar_anexos(
+    aviso_id: Optional[int] = None,
+    rotina_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+    user_data=Depends(decode_access_token)
+):
+    statement = select(Anexo)
+    if aviso_id is not None:
+        statement = statement.where(Anexo.aviso_id == aviso_id)
+    if rotina_id is not None:
+        statement = statement.where(Anexo.rotina_id == rotina_id)
+    return session.exec(statement).all()
+
+@router.get("/{sha256}")
+def download_anexo(
+    sha256: str,
+    size: Optional[int] = None,
+    session: Session = Depends(get_session),
+    user_data=Depends(decode_access_token)
+):
+    """Download com suporte a HTTP Range; ?size=320 devolve a miniatura"""
+    anexo = session.exec(select(Anexo).where(Anexo.sha256 == sha256)).first()
+    if not anexo:
+        raise HTTPException(status_code=404, detail="Anexo not found")
+
+    headers = {"Cache-Control": IMMUTABLE_CACHE, "ETag": f'"{sha256}"'}
+    if size is not None:
+        if size not in THUMBNAIL_SIZES:
+            raise HTTPException(status_code=400, detail=f"Tamanhos disponíveis: {list(THUMBNAIL_SIZES)}")
+        path = content_store.thumbnail_path(sha256, size)
+        if os.path.exists(path):
+            return FileResponse(path, media_type="image/jpeg", headers=headers)
+        # Miniatura ainda sendo gerada (ou perdida/falhou): devolve o original, sem cache,
+        # e garante que uma nova geração esteja agendada
+        if anexo.content_type.startswith("image/"):
+            ensure_thumbnails(sha256, content_store)
+        headers["Cache-Control"] = "no-cache"
+
+    return FileResponse(
+        content_store.path_for(sha256),
+        media_type=anexo.content_type,
+        filename=anexo.filename,
+        headers=headers,
+    )
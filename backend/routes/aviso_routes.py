@@ -1,12 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import List
+from sqlmodel import Session, SQLModel, select
+from typing import List, Optional
+from auth import get_current_active_user
 from database.session import get_session
+from feeds import aviso_feed
 from models.aviso import Aviso
+from models.user import User
 from datetime import datetime
 
 router = APIRouter(prefix="/avisos", tags=["avisos"])
 
+class AvisoFeedItem(SQLModel):
+    id: int
+    title: str
+    content: str
+    created_at: datetime
+    target_classroom: Optional[str] = None
+    read: bool
+
+class UnreadCount(SQLModel):
+    unread: int
+
 @router.post("/", response_model=Aviso)
 def create_aviso(
     aviso_data: Aviso,
@@ -20,6 +34,9 @@ def create_aviso(
         author_id=1
     )
     session.add(aviso)
+    session.flush()
+    # Entrega nas caixas de entrada dos responsáveis, na mesma transação
+    aviso_feed.deliver(session, aviso)
     session.commit()
     session.refresh(aviso)
     return aviso
@@ -34,6 +51,44 @@ def read_avisos(
      avisos = session.exec(statement).all()
      return avisos
 
+@router.get("/feed", response_model=List[AvisoFeedItem])
+def read_feed(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """Avisos visíveis para o usuário logado (da sua turma ou gerais)"""
+    return [
+        AvisoFeedItem(
+            id=aviso.id,
+            title=aviso.title,
+            content=aviso.content,
+            created_at=aviso.created_at,
+            target_classroom=aviso.target_classroom,
+            read=read_at is not None,
+        )
+        for aviso, read_at in aviso_feed.feed(session, current_user.id, skip, limit)
+    ]
+
+@router.get("/feed/unread", response_model=UnreadCount)
+def read_unread_count(
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    return UnreadCount(unread=aviso_feed.unread_count(session, current_user.id))
+
+@router.post("/{aviso_id}/read", status_code=status.HTTP_204_NO_CONTENT)
+def mark_aviso_read(
+    aviso_id: int,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    if not aviso_feed.mark_read(session, current_user.id, aviso_id):
+        raise HTTPException(status_code=404, detail="Aviso not found")
+    session.commit()
+    return None
+
 @router.get("/{aviso_id}", response_model=Aviso)
 def read_aviso(
     aviso_id: int,
@@ -60,6 +115,8 @@ def update_aviso(
             setattr(aviso, key, value)
     aviso.updated_at = datetime.now()
     session.add(aviso)
+    # target_classroom pode ter mudado
+    aviso_feed.deliver(session, aviso)
     session.commit()
     session.refresh(aviso)
     return aviso
@@ -72,6 +129,7 @@ def delete_aviso(
     aviso = session.get(Aviso, aviso_id)
     if not aviso:
         raise HTTPException(status_code=404, detail="Aviso not found")
+    aviso_feed.remove(session, aviso_id)
     session.delete(aviso)
     session.commit()
     return None
\ No newline at end of file
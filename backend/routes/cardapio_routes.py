@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from auth import decode_access_token, get_current_staff_user
+from database.session import get_public_session, get_session
+from database.tenancy import resolve_tenant
+from models.cardapio import CardapioInput, CardapioSemana
+from models.user import User
+
+router = APIRouter(prefix="/cardapio", tags=["Cardápio"])
+
+# Snapshot endereçado por hash nunca muda
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Ponteiro "cardápio da semana" pode mudar com uma nova publicação
+POINTER_CACHE = "private, max-age=60"
+MEAL_ORDER = {"cafe": 0, "almoco": 1, "lanche": 2, "jantar": 3}
+# Publicações simultâneas da mesma semana disputam o próximo número de versão
+PUBLISH_ATTEMPTS = 3
+
+# (tenant, content_hash): cada CMEI só enxerga os próprios snapshots
+SnapshotKey = Tuple[Optional[str], str]
+
+class SnapshotCache:
+    """(tenant, content_hash) -> (json, json gzip). Leituras repetidas não tocam no banco"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[SnapshotKey, Tuple[bytes, bytes]]" = OrderedDict()
+
+    def get(self, key: SnapshotKey) -> Optional[Tuple[bytes, bytes]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: SnapshotKey, payload: bytes, payload_gzip: bytes):
+        self._entries[key] = (payload, payload_gzip)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+snapshot_cache = SnapshotCache()
+
+def week_start_of(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+def snapshot_url(tenant: Optional[str], content_hash: str) -> str:
+    """A URL identifica o CMEI: o snapshot é público e servido sem Authorization"""
+    if tenant:
+        return f"{router.prefix}/{tenant}/{content_hash}.json"
+    return f"{router.prefix}/{content_hash}.json"
+
+def _pointer(snapshot: CardapioSemana, tenant: Optional[str]) -> dict:
+    return {
+        "week_start": snapshot.week_start,
+        "version": snapshot.version,
+        "content_hash": snapshot.content_hash,
+        "url": snapshot_url(tenant, snapshot.content_hash),
+    }
+
+def _latest(session: Session, week_start: date) -> Optional[CardapioSemana]:
+    statement = (
+        select(CardapioSemana)
+        .where(CardapioSemana.week_start == week_start)
+        .order_by(CardapioSemana.version.desc())
+        .limit(1)
+    )
+    return session.exec(statement).first()
+
+def render_itens(itens) -> list:
+    """Forma canônica dos itens (ordem estável), usada no JSON e na comparação entre versões"""
+    ordered = sorted(itens, key=lambda i: (i.dia, MEAL_ORDER.get(i.refeicao, len(MEAL_ORDER)), i.refeicao))
+    return [{"dia": i.dia.isoformat(), "refeicao": i.refeicao, "descricao": i.descricao} for i in ordered]
+
+def _new_snapshot(week_start: date, version: int, itens: list) -> CardapioSemana:
+    published_at = int(time.time())
+    # Serializado e comprimido uma única vez, aqui
+    payload = json.dumps(
+        {"week_start": week_start.isoformat(), "version": version, "published_at": published_at, "itens": itens},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+    return CardapioSemana(
+        week_start=week_start,
+        version=version,
+        content_hash=hashlib.sha256(payload).hexdigest()[:32],
+        published_at=published_at,
+        payload=payload,
+        payload_gzip=gzip.compress(payload, compresslevel=9),
+    )
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+def publicar_cardapio(
+    body: CardapioInput,
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_staff_user)
+):
+    """Publica o cardápio da semana como uma nova versão imutável (só equipe)"""
+    week_start = week_start_of(body.week_start)
+    for item in body.itens:
+        if week_start_of(item.dia) != week_start:
+            raise HTTPException(status_code=400, detail=f"{item.dia} não pertence à semana de {week_start}")
+
+    tenant = resolve_tenant(request)
+    itens = render_itens(body.itens)
+    for _ in range(PUBLISH_ATTEMPTS):
+        latest = _latest(session, week_start)
+        if latest is not None and json.loads(latest.payload)["itens"] == itens:
+            # Nada mudou: mantém a versão atual (e a URL já em cache nos clientes)
+            response.status_code = status.HTTP_200_OK
+            return _pointer(latest, tenant)
+
+        snapshot = _new_snapshot(week_start, latest.version + 1 if latest else 1, itens)
+        session.add(snapshot)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Outra publicação gravou esta versão antes: relê a última e tenta de novo
+            session.rollback()
+            continue
+        session.refresh(snapshot)
+        snapshot_cache.set((tenant, snapshot.content_hash), snapshot.payload, snapshot.payload_gzip)
+        return _pointer(snapshot, tenant)
+
+    raise HTTPException(status_code=409, detail="Cardápio publicado ao mesmo tempo por outra pessoa; tente novamente")
+
+@router.get("/semana")
+def cardapio_da_semana(
+    request: Request,
+    response: Response,
+    dia: Optional[date] = None,
+    session: Session = Depends(get_session),
+    user_data=Depends(decode_access_token)
+):
+    """Ponteiro para o snapshot atual da semana (padrão: semana de hoje)"""
+    snapshot = _latest(session, week_start_of(dia or date.today()))
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Cardápio não publicado para esta semana")
+    response.headers["Cache-Control"] = POINTER_CACHE
+    return _pointer(snapshot, resolve_tenant(request))
+
+@router.get("/{content_hash}.json")
+@router.get("/{tenant}/{content_hash}.json")
+def cardapio_snapshot(
+    content_hash: str,
+    request: Request,
+    session: Session = Depends(get_public_session)
+):
+    """
+    Snapshot imutável, já serializado (e comprimido, se o cliente aceitar gzip).
+    Público para poder ficar em caches/CDN: o cardápio não tem dados pessoais.
+    O CMEI vem do caminho ({tenant}); sem ele, é o da instalação padrão.
+    """
+    headers = {"Cache-Control": IMMUTABLE_CACHE, "ETag": f'"{content_hash}"', "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = (request.path_params.get("tenant"), content_hash)
+    cached = snapshot_cache.get(key)
+    if cached is None:
+        statement = select(CardapioSemana).where(CardapioSemana.content_hash == content_hash)
+        snapshot = session.exec(statement).first()
+        if not snapshot:
+            raise HTTPException(status_code=404, detail="Cardápio não encontrado")
+        cached = (snapshot.payload, snapshot.payload_gzip)
+        snapshot_cache.set(key, *cached)
+
+    payload, payload_gzip = cached
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload_gzip, media_type="application/json", headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlmodel import Session
+from pydantic import BaseModel, field_validator
+from typing import Dict, List, Optional
+import time
+from attendance.log import attendance, start_of_day
+from auth import decode_access_token
+from database.session import get_session
+from database.tenancy import resolve_tenant
+from models.presenca import PresencaTipo
+from models.user import Child
+
+router = APIRouter(prefix="/presenca", tags=["Presença"])
+
+# Tolerância para relógios de tablets/celulares levemente adiantados
+MAX_CLOCK_SKEW_SECONDS = 60
+
+class PresencaInput(BaseModel):
+    child_id: int
+    tipo: PresencaTipo
+    occurred_at: Optional[float] = None  # Unix timestamp; padrão: agora
+
+    @field_validator("occurred_at")
+    @classmethod
+    def occurred_today(cls, value: Optional[float]) -> Optional[float]:
+        """Só eventos de hoje, sem data futura (a visão de presença é do dia corrente)"""
+        if value is None:
+            return value
+        now = time.time()
+        if value > now + MAX_CLOCK_SKEW_SECONDS:
+            raise ValueError("occurred_at está no futuro")
+        if value < start_of_day(now):
+            raise ValueError("occurred_at deve ser de hoje")
+        return value
+
+class CriancaPresente(BaseModel):
+    child_id: int
+    since: float
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+def registrar_presenca(
+    body: PresencaInput,
+    request: Request,
+    session: Session = Depends(get_session),
+    user_data=Depends(decode_access_token)
+):
+    """
+    Entrada/saída da criança. O evento é aceito em memória e gravado em lote
+    (ATTENDANCE_FLUSH_SECONDS); a presença da turma já reflete o evento.
+    """
+    child = session.get(Child, body.child_id)
+    if not child:
+        raise HTTPException(status_code=404, detail="Child not found")
+    attendance.record(resolve_tenant(request), child.id, child.classroom, body.tipo, body.occurred_at)
+    return {"child_id": child.id, "classroom": child.classroom, "tipo": body.tipo}
+
+@router.get("/", response_model=Dict[str, int])
+def presentes_por_turma(request: Request, user_data=Depends(decode_access_token)):
+    """Quantidade de crianças presentes agora em cada turma"""
+    return attendance.get_log(resolve_tenant(request)).counts()
+
+@router.get("/turmas/{classroom}", response_model=List[CriancaPresente])
+def presentes_na_turma(classroom: str, request: Request, user_data=Depends(decode_access_token)):
+    """Crianças presentes agora na turma (visão em memória, sem consultar o banco)"""
+    present = attendance.get_log(resolve_tenant(request)).present_in(classroom)
+    return [CriancaPresente(child_id=child_id, since=since) for child_id, since in present.items()]
\ No newline at end of file
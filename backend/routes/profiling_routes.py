@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from auth import get_current_admin_user
+from middleware.profiling import endpoint_codes, profiler
+
+router = APIRouter(
+    prefix="/admin/profiling",
+    tags=["Profiling"],
+    dependencies=[Depends(get_current_admin_user)],
+)
+
+MAX_WINDOW_SECONDS = 120
+
+class ProfileRequests(BaseModel):
+    route: str  # prefixo do caminho, ex.: "/avisos"
+    count: int = 10
+
+@router.post("/requests", status_code=status.HTTP_202_ACCEPTED)
+def profile_next_requests(body: ProfileRequests, request: Request):
+    """Amostra as próximas `count` requisições cujo caminho começa com `route`"""
+    if body.count < 1:
+        raise HTTPException(status_code=400, detail="count deve ser >= 1")
+    profiler.arm_requests(endpoint_codes(request.app), body.route, body.count)
+    return profiler.results()
+
+@router.post("/sample", status_code=status.HTTP_202_ACCEPTED)
+def sample_window(request: Request, seconds: float = 10):
+    """Amostra todo o processo por `seconds` segundos"""
+    if not 0 < seconds <= MAX_WINDOW_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds deve estar entre 0 e {MAX_WINDOW_SECONDS}")
+    profiler.start_window(endpoint_codes(request.app), seconds)
+    return profiler.results()
+
+@router.get("/results")
+def profiling_results():
+    """Resumo por rota (tempo de CPU estimado pelas amostras)"""
+    return profiler.results()
+
+@router.get("/results/collapsed", response_class=PlainTextResponse)
+def profiling_collapsed():
+    """Pilhas no formato collapsed: `flamegraph.pl` ou speedscope"""
+    if profiler.sampler is None:
+        raise HTTPException(status_code=404, detail="Nenhum profiling executado")
+    return profiler.sampler.collapsed()
+
+@router.delete("/results", status_code=status.HTTP_204_NO_CONTENT)
+def reset_profiling():
+    profiler.reset()
+    return None
\ No newline at end of file
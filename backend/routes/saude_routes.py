@@ -1,10 +1,59 @@
-from fastapi import APIRouter
-from auth import decode_access_token
+from fastapi import APIRouter, HTTPException
+from auth import decode_access_token, get_current_staff_user
 from fastapi import Depends
+from sqlmodel import Session
+from datetime import date
+from typing import Optional
+from analytics import saude as saude_analytics
+from database.session import get_session
 from models.saude import SaudeRecord
+from models.user import Child
 
 router = APIRouter(prefix="/saude", tags=["Saúde"])
 
 @router.get("/")
 def listar_saude(user_data=Depends(decode_access_token)):
-    return [{"tipo": "medicamento", "descricao": "Paracetamol 10ml às 14h"}]
\ No newline at end of file
+    return [{"tipo": "medicamento", "descricao": "Paracetamol 10ml às 14h"}]
+
+@router.post("/", response_model=SaudeRecord)
+def criar_registro_saude(
+    record_data: SaudeRecord,
+    session: Session = Depends(get_session),
+    user_data=Depends(decode_access_token)
+):
+    child = session.get(Child, record_data.child_id)
+    if not child:
+        raise HTTPException(status_code=404, detail="Child not found")
+    # Modelos table=True não validam o corpo: valida aqui (ex.: date em texto ISO -> datetime)
+    record = SaudeRecord.model_validate(record_data.model_dump(exclude={"id"}, warnings=False))
+    session.add(record)
+    session.flush()
+    # Resumo diário da turma atualizado na mesma transação
+    saude_analytics.apply_record(session, record, child.classroom)
+    session.commit()
+    session.refresh(record)
+    return record
+
+@router.get("/tendencias")
+def tendencias(
+    start: date,
+    end: date,
+    classroom: Optional[str] = None,
+    bucket: str = "day",
+    session: Session = Depends(get_session),
+    current_user=Depends(get_current_staff_user)
+):
+    """Tendência de febre/temperatura por turma (day, week ou month), lida dos resumos diários (só equipe)"""
+    if bucket not in ("day", "week", "month"):
+        raise HTTPException(status_code=400, detail="bucket deve ser day, week ou month")
+    return saude_analytics.trend(session, start, end, classroom, bucket)
+
+@router.post("/tendencias/recalcular")
+def recalcular_tendencias(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    session: Session = Depends(get_session),
+    current_user=Depends(get_current_staff_user)
+):
+    """Backfill (só equipe): recalcula os resumos diários a partir dos registros brutos"""
+    return {"rollups": saude_analytics.rebuild_rollups(session, start, end)}
\ No newline at end of file
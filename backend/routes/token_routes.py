@@ -1,8 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
-from auth import authenticate_user, create_access_token
+from sqlalchemy import update
+from sqlmodel import Session, select
+from typing import Optional
+import time
+from auth import (
+    authenticate_user,
+    create_access_token,
+    create_refresh_token,
+    hash_refresh_token,
+    revocation_list,
+    revoke_token_family,
+)
 from database.session import get_session
+from database.tenancy import resolve_tenant
+from models.refresh_token import RefreshToken
 from datetime import timedelta
 from pydantic import BaseModel
 
@@ -11,12 +23,94 @@ router = APIRouter(tags=["authentication"])
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+def _issue_tokens(session: Session, request: Request, subject: str, role: Optional[str] = None,
+                  family_id: Optional[str] = None):
+    """Gera um novo par access + refresh token (refresh rotativo na mesma família)"""
+    refresh_token, record = create_refresh_token(session, subject, role, family_id)
+    session.commit()
+
+    token_data = {"sub": subject, "fid": record.family_id}
+    tenant = resolve_tenant(request)
+    if tenant:
+        token_data["tenant"] = tenant
+    if role:
+        token_data["role"] = role
+    access_token = create_access_token(data=token_data, expires_delta=timedelta(minutes=30))
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+def _find_refresh_token(session: Session, refresh_token: str):
+    revocation_list.maybe_sync(session.get_bind())
+    statement = select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(refresh_token))
+    record = session.exec(statement).first()
+    if (
+        record is None
+        or record.expires_at <= time.time()
+        or record.revoked_at is not None
+        or revocation_list.is_revoked(record.family_id)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido ou expirado.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return record
 
 @router.post("/token", response_model=Token)
 def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: Session = Depends(get_session)
 ):
-    # MVP bypass: aceitar qualquer usuário (inclusive 'lucas') sem verificar senha
-    access_token = create_access_token(data={"sub": form_data.username}, expires_delta=timedelta(minutes=30))
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Com refresh tokens o login (bcrypt) é raro: a senha é sempre verificada
+    user = authenticate_user(form_data.username, form_data.password, session)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuário ou senha incorretos.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not user.active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    # Papel no token para priorização no controle de admissão (professores > pais)
+    return _issue_tokens(session, request, user.username, user.user_type.value)
+
+@router.post("/token/refresh", response_model=Token)
+def refresh_access_token(
+    request: Request,
+    body: RefreshRequest,
+    session: Session = Depends(get_session)
+):
+    """Troca um refresh token por um novo par de tokens, sem verificar senha (bcrypt)"""
+    record = _find_refresh_token(session, body.refresh_token)
+    # Marca como usado de forma atômica: entre duas trocas concorrentes só uma vence
+    claimed = session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == record.id, RefreshToken.rotated == False)  # noqa: E712
+        .values(rotated=True)
+    ).rowcount
+    if claimed == 0:
+        # Token já usado: provável vazamento, revoga todo o login
+        revoke_token_family(session, record.family_id)
+        session.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token já utilizado.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _issue_tokens(session, request, record.subject, record.role, record.family_id)
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_refresh_token(
+    body: RefreshRequest,
+    session: Session = Depends(get_session)
+):
+    """Logout: revoga o refresh token e todos os tokens derivados do mesmo login"""
+    record = _find_refresh_token(session, body.refresh_token)
+    revoke_token_family(session, record.family_id)
+    session.commit()
+    return None
@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from config import ATTACHMENTS_DIR, THUMBNAIL_SIZES, THUMBNAIL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Miniatura que falhou (ex.: imagem corrompida) só é tentada de novo depois deste intervalo
+THUMBNAIL_RETRY_SECONDS = 300
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+
+class ContentStore:
+    """
+    Armazenamento local endereçado por conteúdo (SHA-256).
+    Arquivos iguais são gravados uma única vez e nunca mudam,
+    por isso podem ser servidos com cache imutável.
+    """
+
+    def __init__(self, root: str = ATTACHMENTS_DIR):
+        self.root = root
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, "blobs", sha256[:2], sha256)
+
+    def thumbnail_path(self, sha256: str, size: int) -> str:
+        return os.path.join(self.root, "thumbs", sha256[:2], f"{sha256}_{size}.jpg")
+
+    async def save_stream(self, chunks: AsyncIterator[bytes], max_bytes: int) -> Tuple[str, int]:
+        """
+        Grava o corpo da requisição pedaço a pedaço, calculando o hash no caminho.
+        Retorna (sha256, tamanho). Nunca mantém o arquivo inteiro em memória.
+        """
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        f = open(tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AttachmentTooLarge()
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+            f.close()
+            sha256 = digest.hexdigest()
+            final_path = self.path_for(sha256)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)  # Conteúdo já armazenado
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return sha256, size
+        except BaseException:
+            f.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def make_thumbnails(source: str, targets: dict) -> list:
+    """
+    Gera miniaturas JPEG (executa em outro processo).
+    targets: {tamanho: caminho_destino}
+    """
+    from PIL import Image
+
+    created = []
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        for size, target in sorted(targets.items(), reverse=True):
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            image.thumbnail((size, size))
+            tmp_target = f"{target}.{os.getpid()}.tmp"
+            image.save(tmp_target, "JPEG", quality=85)
+            os.replace(tmp_target, target)
+            created.append(target)
+    return created
+
+
+content_store = ContentStore()
+_thumbnail_pool: Optional[ProcessPoolExecutor] = None
+_pending: Dict[str, Future] = {}  # sha256 -> geração em andamento
+_failed_at: Dict[str, float] = {}  # sha256 -> momento da última falha
+_jobs_lock = threading.Lock()
+
+
+def schedule_thumbnails(sha256: str, store: ContentStore = content_store) -> Future:
+    """Agenda a geração das miniaturas fora do caminho da requisição (uma por arquivo por vez)"""
+    global _thumbnail_pool
+    with _jobs_lock:
+        future = _pending.get(sha256)
+        if future is not None:
+            return future
+        if _thumbnail_pool is None:
+            _thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+        targets = {size: store.thumbnail_path(sha256, size) for size in THUMBNAIL_SIZES}
+        future = _pending[sha256] = _thumbnail_pool.submit(make_thumbnails, store.path_for(sha256), targets)
+    future.add_done_callback(functools.partial(_thumbnails_done, sha256))
+    return future
+
+
+def _thumbnails_done(sha256: str, future: Future):
+    with _jobs_lock:
+        _pending.pop(sha256, None)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is None:
+        _failed_at.pop(sha256, None)
+        return
+    _failed_at[sha256] = time.monotonic()
+    logger.error("Falha ao gerar miniaturas de %s", sha256, exc_info=error)
+
+
+def ensure_thumbnails(sha256: str, store: ContentStore = content_store) -> Optional[Future]:
+    """
+    Reagenda miniaturas ausentes (job perdido num restart, ou que falhou há mais de
+    THUMBNAIL_RETRY_SECONDS). Chamado quando uma miniatura pedida não existe.
+    """
+    failed_at = _failed_at.get(sha256)
+    if failed_at is not None and time.monotonic() - failed_at < THUMBNAIL_RETRY_SECONDS:
+        return None
+    return schedule_thumbnails(sha256, store)
+
+
+def shutdown_thumbnail_pool():
+    global _thumbnail_pool
+    if _thumbnail_pool is not None:
+        _thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+        _thumbnail_pool = None
@@ -0,0 +1,35 @@
+import pytest
+from sqlmodel import SQLModel, Session, create_engine
+from main import app
+from database.session import get_public_session, get_session
+from middleware.admission import AdmissionControlMiddleware, InMemoryBucketBackend
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """Banco SQLite temporário com todas as tabelas, usado pelas rotas do app via get_session"""
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    SQLModel.metadata.create_all(engine)
+
+    def override_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_public_session] = override_session
+    yield engine
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_admission_buckets():
+    """Os buckets do controle de admissão vivem no processo: cada teste começa com eles cheios"""
+    if app.middleware_stack is None:
+        app.middleware_stack = app.build_middleware_stack()
+    middleware = app.middleware_stack
+    while middleware is not None and not isinstance(middleware, AdmissionControlMiddleware):
+        middleware = getattr(middleware, "app", None)
+    if middleware is not None:
+        middleware.backend = InMemoryBucketBackend()
+        middleware.in_flight = 0
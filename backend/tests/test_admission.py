@@ -0,0 +1,119 @@
+import pytest
+from jose import jwt
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from starlette.requests import Request
+from auth import create_access_token
+from database import routing
+from middleware.admission import AdmissionControlMiddleware, AdmissionMetrics, InMemoryBucketBackend
+
+
+def _build_app(**options):
+    app = FastAPI()
+
+    @app.get("/avisos/")
+    def listar():
+        return []
+
+    @app.post("/avisos/")
+    def criar():
+        return {"ok": True}
+
+    metrics = AdmissionMetrics()
+    app.add_middleware(AdmissionControlMiddleware, metrics=metrics, **options)
+    return app, metrics
+
+
+def _headers(user, role):
+    return {"Authorization": f"Bearer {create_access_token({'sub': user, 'role': role})}"}
+
+
+def test_token_bucket_refills():
+    backend = InMemoryBucketBackend()
+    assert backend.take("k", rate=1, burst=1) == (True, 0.0)
+    allowed, retry_after = backend.take("k", rate=1, burst=1)
+    assert not allowed
+    assert 0 < retry_after <= 1
+
+
+@pytest.mark.asyncio
+async def test_user_rate_limit_returns_429_with_retry_after():
+    app, metrics = _build_app(user_rate=0.1, user_burst=2)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers = _headers("maria", "parent")
+        assert (await ac.get("/avisos/", headers=headers)).status_code == 200
+        assert (await ac.get("/avisos/", headers=headers)).status_code == 200
+        response = await ac.get("/avisos/", headers=headers)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+        # Outro usuário tem seu próprio bucket
+        assert (await ac.get("/avisos/", headers=_headers("joana", "parent"))).status_code == 200
+
+    assert metrics.snapshot()["shed"] == {"user_rate:GET /avisos": 1}
+
+
+@pytest.mark.asyncio
+async def test_overload_sheds_parent_polling_before_teacher_writes():
+    app, metrics = _build_app(max_concurrency=10)
+    app.middleware_stack = app.build_middleware_stack()
+    middleware = app.middleware_stack
+    while not isinstance(middleware, AdmissionControlMiddleware):
+        middleware = middleware.app
+    # Simula 7 requisições em andamento (acima da fatia de 60% dos pais)
+    middleware.in_flight = 7
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/avisos/", headers=_headers("maria", "parent"))
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+        response = await ac.post("/avisos/", headers=_headers("lucas", "teacher"))
+        assert response.status_code == 200
+
+    assert metrics.snapshot()["shed_total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_paths_share_one_metric_label():
+    app, metrics = _build_app(route_rate=0.1, route_burst=1)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for path in ("/a1", "/b2", "/c3"):
+            await ac.get(path)
+    # Um único bucket/rótulo para caminhos desconhecidos
+    assert metrics.snapshot()["shed"] == {"route_rate:GET /other": 2}
+
+
+@pytest.mark.asyncio
+async def test_token_is_decoded_once_per_request(monkeypatch):
+    from database import tenancy
+    from main import app
+
+    calls = []
+    decode = jwt.decode
+    monkeypatch.setattr(tenancy.jwt, "decode", lambda *args, **kwargs: calls.append(1) or decode(*args, **kwargs))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/rotina/", headers=_headers("lucas", "teacher"))
+    assert response.status_code == 200
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_anonymous_requests_have_their_own_limit():
+    app, metrics = _build_app(user_rate=0.1, user_burst=1, anonymous_rate=0.1, anonymous_burst=3)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        statuses = [(await ac.get("/avisos/")).status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    assert metrics.snapshot()["shed"] == {"anonymous_rate:GET /avisos": 1}
+
+
+def test_client_ip_from_trusted_proxy(monkeypatch):
+    def request(client, forwarded=None):
+        headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+        return Request({"type": "http", "method": "GET", "headers": headers, "client": (client, 5000)})
+
+    monkeypatch.setattr(routing, "TRUSTED_PROXIES", {"10.0.0.1"})
+    assert routing.client_ip(request("10.0.0.1", "203.0.113.7, 10.0.0.1")) == "203.0.113.7"
+    # Cabeçalho de quem não é proxy confiável é ignorado (poderia ser forjado)
+    assert routing.client_ip(request("198.51.100.2", "203.0.113.7")) == "198.51.100.2"
+    assert routing.request_identity(request("10.0.0.1", "1.2.3.4, 203.0.113.7")) == "ip:203.0.113.7"
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from sqlmodel import Session, select
+from main import app
+from auth import create_access_token
+from models.anexo import Anexo
+from routes import anexo_routes
+from storage import attachments
+from storage.attachments import AttachmentTooLarge, ContentStore, make_thumbnails
+
+
+async def _chunks(data, size=4):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.mark.asyncio
+async def test_save_stream_is_content_addressed(tmp_path):
+    store = ContentStore(str(tmp_path))
+    data = b"foto da atividade"
+
+    sha256, size = await store.save_stream(_chunks(data), max_bytes=1024)
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    assert open(store.path_for(sha256), "rb").read() == data
+
+    # Mesmo conteúdo: mesmo endereço, nenhum temporário sobrando
+    assert (await store.save_stream(_chunks(data), max_bytes=1024))[0] == sha256
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+    with pytest.raises(AttachmentTooLarge):
+        await store.save_stream(_chunks(b"x" * 100), max_bytes=10)
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_make_thumbnails(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "foto.png"
+    Image.new("RGB", (2000, 1000), "red").save(source)
+
+    target = tmp_path / "thumbs" / "foto_320.jpg"
+    make_thumbnails(str(source), {320: str(target)})
+    with Image.open(target) as thumb:
+        assert thumb.size == (320, 160)
+
+
+@pytest.mark.asyncio
+async def test_download_supports_range_and_immutable_cache(db_engine, tmp_path, monkeypatch):
+    store = ContentStore(str(tmp_path))
+    data = b"0123456789"
+    sha256, size = await store.save_stream(_chunks(data), max_bytes=1024)
+    monkeypatch.setattr(anexo_routes, "content_store", store)
+
+    with Session(db_engine) as session:
+        session.add(Anexo(sha256=sha256, filename="foto.jpg", content_type="image/jpeg", size=size,
+                          created_at=datetime.now(timezone.utc)))
+        session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'maria'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get(f"/anexos/{sha256}", headers=headers)
+        assert response.status_code == 200
+        assert response.content == data
+        assert "immutable" in response.headers["cache-control"]
+
+        response = await ac.get(f"/anexos/{sha256}", headers={**headers, "Range": "bytes=2-5"})
+        assert response.status_code == 206
+        assert response.content == b"2345"
+
+        assert (await ac.get("/anexos/" + "0" * 64, headers=headers)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_streams_body_and_stores_anexo(db_engine, tmp_path, monkeypatch):
+    store = ContentStore(str(tmp_path))
+    monkeypatch.setattr(anexo_routes, "content_store", store)
+    scheduled = []
+    monkeypatch.setattr(anexo_routes, "schedule_thumbnails", lambda sha256, store: scheduled.append(sha256))
+    data = b"\xff\xd8 foto do passeio"
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'maria'})}", "Content-Type": "image/jpeg"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/anexos/", params={"filename": "../passeio.jpg", "aviso_id": 7},
+                                 content=data, headers=headers)
+    assert response.status_code == 200
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    assert response.json()["sha256"] == sha256
+    with Session(db_engine) as session:
+        anexo = session.exec(select(Anexo)).one()
+    assert (anexo.sha256, anexo.filename, anexo.content_type, anexo.size, anexo.aviso_id) == \
+        (sha256, "passeio.jpg", "image/jpeg", len(data), 7)
+    assert open(store.path_for(sha256), "rb").read() == data
+    assert scheduled == [sha256]
+
+
+def test_thumbnail_failure_is_logged_and_not_retried_immediately(tmp_path, monkeypatch, caplog):
+    store = ContentStore(str(tmp_path))
+    sha256 = hashlib.sha256(b"nao e imagem").hexdigest()
+    os.makedirs(os.path.dirname(store.path_for(sha256)))
+    open(store.path_for(sha256), "wb").write(b"nao e imagem")
+    monkeypatch.setattr(attachments, "_thumbnail_pool", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(attachments, "_pending", {})
+    monkeypatch.setattr(attachments, "_failed_at", {})
+
+    with caplog.at_level(logging.ERROR, logger="storage.attachments"):
+        future = attachments.schedule_thumbnails(sha256, store)
+        with pytest.raises(Exception):
+            future.result()
+        attachments._thumbnail_pool.shutdown(wait=True)
+    assert any(sha256 in record.getMessage() for record in caplog.records)
+    assert attachments._pending == {}
+    assert attachments.ensure_thumbnails(sha256, store) is None
+
+
+@pytest.mark.asyncio
+async def test_missing_thumbnail_is_regenerated_on_demand(db_engine, tmp_path, monkeypatch):
+    store = ContentStore(str(tmp_path))
+    sha256, size = await store.save_stream(_chunks(b"original"), max_bytes=1024)
+    monkeypatch.setattr(anexo_routes, "content_store", store)
+    requested = []
+    monkeypatch.setattr(anexo_routes, "ensure_thumbnails", lambda sha256, store: requested.append(sha256))
+
+    with Session(db_engine) as session:
+        session.add(Anexo(sha256=sha256, filename="foto.jpg", content_type="image/jpeg", size=size,
+                          created_at=datetime.now(timezone.utc)))
+        session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'maria'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get(f"/anexos/{sha256}", params={"size": 320}, headers=headers)
+    assert response.status_code == 200
+    assert response.content == b"original"
+    assert response.headers["cache-control"] == "no-cache"
+    assert requested == [sha256]
@@ -0,0 +1,107 @@
+import pytest
+from datetime import datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from sqlmodel import Session, select
+from main import app
+from auth import create_access_token
+from feeds import aviso_feed
+from models.aviso import Aviso
+from models.aviso_inbox import AvisoInbox
+from models.user import Child, ChildParentLink, User, UserType
+
+NOW = datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=[True, False], ids=["inbox", "membership"])
+def engine(request, db_engine, monkeypatch):
+    monkeypatch.setattr(aviso_feed, "AVISO_INBOX_ENABLED", request.param)
+    monkeypatch.setattr(aviso_feed, "membership_cache", aviso_feed.MembershipCache())
+    with Session(db_engine) as session:
+        for user_id, username, user_type in ((1, "lucas", UserType.TEACHER), (2, "maria", UserType.PARENT), (3, "joana", UserType.PARENT)):
+            session.add(User(id=user_id, username=username, email=f"{username}@test.com", hashed_password="x",
+                             full_name=username, user_type=user_type, created_at=NOW))
+        session.add(Child(id=1, name="Ana", birth_date=NOW, classroom="Maternal A"))
+        session.add(Child(id=2, name="Caio", birth_date=NOW, classroom="Berçário"))
+        session.add(ChildParentLink(parent_id=2, child_id=1))
+        session.add(ChildParentLink(parent_id=3, child_id=2))
+        session.commit()
+
+        for title, classroom in (("Geral", None), ("Maternal", "Maternal A"), ("Berçário", "Berçário")):
+            aviso = Aviso(title=title, content="...", author_id=1, target_classroom=classroom, created_at=NOW)
+            session.add(aviso)
+            session.flush()
+            aviso_feed.deliver(session, aviso)
+        session.commit()
+    return db_engine
+
+
+def _headers(username):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+@pytest.mark.asyncio
+async def test_feed_unread_counts_and_read_receipts(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        feed = (await ac.get("/avisos/feed", headers=_headers("maria"))).json()
+        assert [item["title"] for item in feed] == ["Maternal", "Geral"]
+        assert (await ac.get("/avisos/feed/unread", headers=_headers("maria"))).json() == {"unread": 2}
+
+        assert (await ac.post(f"/avisos/{feed[0]['id']}/read", headers=_headers("maria"))).status_code == 204
+        assert (await ac.get("/avisos/feed/unread", headers=_headers("maria"))).json() == {"unread": 1}
+        feed = (await ac.get("/avisos/feed", headers=_headers("maria"))).json()
+        assert [item["read"] for item in feed] == [True, False]
+
+        # Aviso de outra turma não é visível
+        joana_feed = (await ac.get("/avisos/feed", headers=_headers("joana"))).json()
+        assert [item["title"] for item in joana_feed] == ["Berçário", "Geral"]
+        assert (await ac.post(f"/avisos/{feed[0]['id']}/read", headers=_headers("joana"))).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_teacher_feed_is_the_same_in_both_modes(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        feed = (await ac.get("/avisos/feed", headers=_headers("lucas"))).json()
+        assert [item["title"] for item in feed] == ["Geral"]
+        assert (await ac.get("/avisos/feed/unread", headers=_headers("lucas"))).json() == {"unread": 1}
+
+
+def test_redeliver_after_target_change(engine):
+    with Session(engine) as session:
+        aviso = session.get(Aviso, 2)
+        aviso.target_classroom = "Berçário"
+        session.add(aviso)
+        aviso_feed.deliver(session, aviso)
+        session.commit()
+        titles = [a.title for a, _ in aviso_feed.feed(session, 3)]
+    assert titles == ["Berçário", "Maternal", "Geral"]
+
+
+def test_membership_changes_redeliver_inbox(engine):
+    with Session(engine) as session:
+        # Novo responsável recebe os avisos gerais; o vínculo traz os da turma
+        session.add(User(id=4, username="rita", email="rita@test.com", hashed_password="x",
+                         full_name="rita", user_type=UserType.PARENT, created_at=NOW))
+        session.commit()
+        assert [a.title for a, _ in aviso_feed.feed(session, 4)] == ["Geral"]
+        session.add(ChildParentLink(parent_id=4, child_id=1))
+        session.commit()
+        assert [a.title for a, _ in aviso_feed.feed(session, 4)] == ["Maternal", "Geral"]
+
+        # Criança muda de turma: os dois responsáveis passam a ver o Berçário
+        child = session.get(Child, 1)
+        child.classroom = "Berçário"
+        session.add(child)
+        session.commit()
+        for parent_id in (2, 4):
+            assert [a.title for a, _ in aviso_feed.feed(session, parent_id)] == ["Berçário", "Geral"]
+
+
+def test_backfill_delivers_existing_avisos(engine):
+    with Session(engine) as session:
+        for row in session.exec(select(AvisoInbox)).all():
+            session.delete(row)
+        session.commit()
+        # Sem caixa de entrada materializada não há o que entregar
+        assert aviso_feed.backfill(session) == (3 if aviso_feed.AVISO_INBOX_ENABLED else 0)
+        session.commit()
+        assert [a.title for a, _ in aviso_feed.feed(session, 2)] == ["Maternal", "Geral"]
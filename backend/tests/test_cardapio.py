@@ -0,0 +1,168 @@
+import json
+import pytest
+from datetime import date, datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
+from sqlmodel import Session, select
+from main import app
+from auth import create_access_token
+from models.cardapio import CardapioSemana
+from models.user import User, UserType
+from database import tenancy
+from routes import cardapio_routes
+
+NOW = datetime(2025, 3, 3, tzinfo=timezone.utc)
+ITENS = [
+    {"dia": "2025-03-04", "refeicao": "almoco", "descricao": "Arroz, feijão e frango"},
+    {"dia": "2025-03-03", "refeicao": "lanche", "descricao": "Banana"},
+    {"dia": "2025-03-03", "refeicao": "cafe", "descricao": "Pão e leite"},
+]
+
+
+@pytest.fixture
+def engine(db_engine, monkeypatch):
+    monkeypatch.setattr(cardapio_routes, "snapshot_cache", cardapio_routes.SnapshotCache())
+    with Session(db_engine) as session:
+        session.add(User(id=1, username="lucas", email="lucas@test.com", hashed_password="x",
+                         full_name="Lucas", user_type=UserType.TEACHER, created_at=NOW))
+        session.add(User(id=2, username="maria", email="maria@test.com", hashed_password="x",
+                         full_name="Maria", user_type=UserType.PARENT, created_at=NOW))
+        session.commit()
+    return db_engine
+
+
+def _headers(username):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+@pytest.mark.asyncio
+async def test_publish_and_serve_immutable_snapshot(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/cardapio/", json={"week_start": "2025-03-05", "itens": ITENS},
+                              headers=_headers("maria"))).status_code == 403
+
+        response = await ac.post("/cardapio/", json={"week_start": "2025-03-05", "itens": ITENS}, headers=_headers("lucas"))
+        assert response.status_code == 201
+        first = response.json()
+        assert first["week_start"] == "2025-03-03"
+        assert first["version"] == 1
+
+        # Mesmo conteúdo: nada criado (200), mesma versão e mesma URL
+        again = await ac.post("/cardapio/", json={"week_start": "2025-03-03", "itens": ITENS}, headers=_headers("lucas"))
+        assert again.status_code == 200
+        assert again.json() == first
+
+        pointer = await ac.get("/cardapio/semana", params={"dia": "2025-03-07"}, headers=_headers("maria"))
+        assert pointer.json()["url"] == first["url"]
+        assert pointer.headers["cache-control"] == "private, max-age=60"
+
+        response = await ac.get(first["url"], headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+        assert response.headers["content-encoding"] == "gzip"
+        body = response.json()
+        assert [(i["dia"], i["refeicao"]) for i in body["itens"]] == [
+            ("2025-03-03", "cafe"), ("2025-03-03", "lanche"), ("2025-03-04", "almoco"),
+        ]
+
+        raw = await ac.get(first["url"], headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in raw.headers
+        assert json.loads(raw.content) == body
+
+        etag = response.headers["etag"]
+        assert (await ac.get(first["url"], headers={"If-None-Match": etag})).status_code == 304
+
+        # Nova publicação: nova versão e novo endereço; o antigo continua válido
+        changed = ITENS + [{"dia": "2025-03-05", "refeicao": "almoco", "descricao": "Sopa"}]
+        second = (await ac.post("/cardapio/", json={"week_start": "2025-03-03", "itens": changed}, headers=_headers("lucas"))).json()
+        assert second["version"] == 2
+        assert second["url"] != first["url"]
+        assert (await ac.get(first["url"])).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_snapshot_reads_come_from_memory(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        published = (await ac.post("/cardapio/", json={"week_start": "2025-03-03", "itens": ITENS}, headers=_headers("lucas"))).json()
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        for _ in range(3):
+            response = await ac.get(published["url"], headers={"Accept-Encoding": "gzip"})
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.json()["version"] == 1
+        assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_items_outside_week_are_rejected(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        itens = [{"dia": "2025-03-10", "refeicao": "almoco", "descricao": "Sopa"}]
+        response = await ac.post("/cardapio/", json={"week_start": "2025-03-03", "itens": itens}, headers=_headers("lucas"))
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_concurrent_publish_retries_next_version(engine, monkeypatch):
+    with Session(engine) as session:
+        # Publicação concorrente já gravou a versão 1
+        outro = [{"dia": "2025-03-03", "refeicao": "cafe", "descricao": "Outro"}]
+        session.add(cardapio_routes._new_snapshot(date(2025, 3, 3), 1, outro))
+        session.commit()
+
+    latest = cardapio_routes._latest
+    stale_reads = iter([None])
+    monkeypatch.setattr(cardapio_routes, "_latest", lambda session, week: next(stale_reads, None) or latest(session, week))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/cardapio/", json={"week_start": "2025-03-03", "itens": ITENS}, headers=_headers("lucas"))
+    assert response.status_code == 201
+    assert response.json()["version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_publish_conflict_returns_409(engine, monkeypatch):
+    with Session(engine) as session:
+        session.add(cardapio_routes._new_snapshot(date(2025, 3, 3), 1, []))
+        session.commit()
+
+    # Sempre perde a corrida
+    monkeypatch.setattr(cardapio_routes, "_latest", lambda session, week: None)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/cardapio/", json={"week_start": "2025-03-03", "itens": ITENS}, headers=_headers("lucas"))
+    assert response.status_code == 409
+    with Session(engine) as session:
+        assert len(session.exec(select(CardapioSemana)).all()) == 1
+
+
+def test_snapshot_cache_is_per_tenant():
+    cache = cardapio_routes.SnapshotCache()
+    cache.set(("creche-a", "abc"), b"{}", b"gz")
+    assert cache.get(("creche-a", "abc")) == (b"{}", b"gz")
+    assert cache.get(("creche-b", "abc")) is None
+    assert cache.get((None, "abc")) is None
+
+
+@pytest.mark.asyncio
+async def test_tenant_snapshot_url_works_without_authorization(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_DATABASE_URL", f"sqlite:///{tmp_path}/{{tenant}}.db")
+    monkeypatch.setattr(tenancy, "tenant_engines", tenancy.TenantEngineCache())
+    monkeypatch.setattr(cardapio_routes, "snapshot_cache", cardapio_routes.SnapshotCache())
+    with Session(tenancy.create_tenant_db("creche-a")) as session:
+        session.add(User(id=1, username="lucas", email="lucas@test.com", hashed_password="x",
+                         full_name="Lucas", user_type=UserType.TEACHER, created_at=NOW))
+        session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'lucas', 'tenant': 'creche-a'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        published = (await ac.post("/cardapio/", json={"week_start": "2025-03-03", "itens": ITENS}, headers=headers)).json()
+        assert published["url"] == f"/cardapio/creche-a/{published['content_hash']}.json"
+
+        # Sem cache em memória: a URL sozinha leva ao banco do CMEI
+        monkeypatch.setattr(cardapio_routes, "snapshot_cache", cardapio_routes.SnapshotCache())
+        response = await ac.get(published["url"])
+        assert response.status_code == 200
+        assert response.json()["version"] == 1
+
+        assert (await ac.get(f"/cardapio/creche-b/{published['content_hash']}.json")).status_code == 404
+        assert (await ac.get(f"/cardapio/..%2Fx/{published['content_hash']}.json")).status_code == 404
+    tenancy.tenant_engines.clear()
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, HTTPException
+from httpx import AsyncClient, ASGITransport
+from auth import create_access_token
+from middleware.admission import AdmissionControlMiddleware, InMemoryBucketBackend
+from middleware.idempotency import IdempotencyMiddleware
+
+
+def _build_app():
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/avisos/")
+    async def criar(payload: dict):
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        if payload.get("fail"):
+            raise HTTPException(status_code=503)
+        return {"id": app.state.calls, **payload}
+
+    app.add_middleware(IdempotencyMiddleware)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_retry_with_same_key_is_replayed():
+    app = _build_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers = {"Idempotency-Key": "abc"}
+        first = await ac.post("/avisos/", json={"title": "Festa"}, headers=headers)
+        retry = await ac.post("/avisos/", json={"title": "Festa"}, headers=headers)
+        assert retry.status_code == first.status_code == 200
+        assert retry.json() == first.json() == {"id": 1, "title": "Festa"}
+        assert retry.headers["idempotent-replayed"] == "true"
+
+        # Mesma chave, outro corpo
+        assert (await ac.post("/avisos/", json={"title": "Outro"}, headers=headers)).status_code == 422
+        # Sem chave: executa normalmente
+        assert (await ac.post("/avisos/", json={"title": "Festa"})).json()["id"] == 2
+    assert app.state.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced():
+    app = _build_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        responses = await asyncio.gather(*[
+            ac.post("/avisos/", json={"title": "Festa"}, headers={"Idempotency-Key": "xyz"}) for _ in range(5)
+        ])
+    assert app.state.calls == 1
+    assert {r.json()["id"] for r in responses} == {1}
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_not_stored():
+    app = _build_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers = {"Idempotency-Key": "falha"}
+        assert (await ac.post("/avisos/", json={"fail": True}, headers=headers)).status_code == 503
+        assert (await ac.post("/avisos/", json={"fail": True}, headers=headers)).status_code == 503
+    assert app.state.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_request_shed_by_admission_control_can_be_retried():
+    app = _build_app()
+    backend = InMemoryBucketBackend()
+    app.user_middleware.clear()
+    # Mesma ordem do main.py: idempotência por fora do controle de admissão
+    app.add_middleware(AdmissionControlMiddleware, backend=backend, anonymous_rate=0.001, anonymous_burst=1)
+    app.add_middleware(IdempotencyMiddleware)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/avisos/", json={"title": "Outro"})).status_code == 200
+
+        headers = {"Idempotency-Key": "manha"}
+        shed = await ac.post("/avisos/", json={"title": "Festa"}, headers=headers)
+        assert shed.status_code == 429
+
+        # Bucket reabastecido: a repetição idêntica executa (não é 422 nem replay do 429)
+        backend._buckets.clear()
+        retry = await ac.post("/avisos/", json={"title": "Festa"}, headers=headers)
+        assert retry.status_code == 200
+        assert "idempotent-replayed" not in retry.headers
+        assert (await ac.post("/avisos/", json={"title": "Festa"}, headers=headers)).headers["idempotent-replayed"] == "true"
+    assert app.state.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_keys_are_scoped_by_tenant():
+    app = _build_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for tenant in ("creche-a", "creche-b"):
+            token = create_access_token({"sub": "lucas", "tenant": tenant})
+            headers = {"Idempotency-Key": "mesma", "Authorization": f"Bearer {token}"}
+            response = await ac.post("/avisos/", json={"title": "Festa"}, headers=headers)
+            assert "idempotent-replayed" not in response.headers
+    assert app.state.calls == 2
@@ -0,0 +1,124 @@
+import time
+import pytest
+from datetime import datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from sqlmodel import Session, create_engine, select
+from main import app
+from attendance import log as attendance_log
+from attendance.log import AttendanceLog, AttendanceService
+from auth import create_access_token
+from database import tenancy
+from models.presenca import PresencaEvento, PresencaTipo
+from models.user import Child
+from routes import presenca_routes
+
+
+@pytest.fixture
+def engine(db_engine, monkeypatch):
+    monkeypatch.setattr(attendance_log, "default_engine", db_engine)
+    with Session(db_engine) as session:
+        birth = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        session.add(Child(id=1, name="Ana", birth_date=birth, classroom="Maternal A"))
+        session.add(Child(id=2, name="Bia", birth_date=birth, classroom="Maternal A"))
+        session.add(Child(id=3, name="Caio", birth_date=birth, classroom="Berçário"))
+        session.commit()
+    return db_engine
+
+
+def test_events_are_buffered_and_view_is_rebuilt_from_log(engine):
+    log = AttendanceLog()
+    now = time.time()
+    log.record(1, "Maternal A", PresencaTipo.CHECK_IN, now)
+    log.record(2, "Maternal A", PresencaTipo.CHECK_IN, now + 1)
+    log.record(3, "Berçário", PresencaTipo.CHECK_IN, now + 2)
+    log.record(2, "Maternal A", PresencaTipo.CHECK_OUT, now + 3)
+
+    # Visão imediata, nada gravado ainda
+    assert log.present_in("Maternal A") == {1: now}
+    assert log.counts() == {"Maternal A": 1, "Berçário": 1}
+    with Session(engine) as session:
+        assert session.exec(select(PresencaEvento)).all() == []
+
+    assert log.flush() == 4
+    assert log.pending == 0
+    with Session(engine) as session:
+        assert len(session.exec(select(PresencaEvento)).all()) == 4
+
+    restarted = AttendanceLog()
+    restarted.rebuild()
+    assert restarted.present_in("Maternal A") == {1: now}
+    assert restarted.counts() == {"Maternal A": 1, "Berçário": 1}
+
+
+def test_backdated_event_matches_rebuild_order(engine):
+    log = AttendanceLog()
+    now = time.time()
+    log.record(1, "Maternal A", PresencaTipo.CHECK_IN, now)
+    # Saída registrada depois, mas com horário anterior à entrada
+    log.record(1, "Maternal A", PresencaTipo.CHECK_OUT, now - 60)
+    log.flush()
+
+    restarted = AttendanceLog()
+    restarted.rebuild()
+    assert log.present_in("Maternal A") == restarted.present_in("Maternal A") == {1: now}
+
+
+def test_view_resets_when_day_turns_on_read(engine, monkeypatch):
+    log = AttendanceLog()
+    log.record(1, "Maternal A", PresencaTipo.CHECK_IN)
+    tomorrow = log.day + attendance_log.DAY_SECONDS
+    monkeypatch.setattr(attendance_log, "start_of_day", lambda now=None: tomorrow)
+    assert log.counts() == {}
+    assert log.present_in("Maternal A") == {}
+
+
+def test_failed_flush_keeps_events(engine, tmp_path, monkeypatch):
+    log = AttendanceLog()
+    monkeypatch.setattr(attendance_log, "default_engine", create_engine(f"sqlite:///{tmp_path}/sem_tabelas.db"))
+    log.record(1, "Maternal A", PresencaTipo.CHECK_IN)
+    with pytest.raises(Exception):
+        log.flush()
+    assert log.pending == 1
+
+
+@pytest.mark.asyncio
+async def test_presenca_routes(engine, monkeypatch):
+    service = AttendanceService(flush_seconds=60)
+    monkeypatch.setattr(presenca_routes, "attendance", service)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'lucas'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/presenca/", json={"child_id": 1, "tipo": "check_in"}, headers=headers)
+        assert response.status_code == 202
+        assert (await ac.post("/presenca/", json={"child_id": 99, "tipo": "check_in"}, headers=headers)).status_code == 404
+        # Só eventos de hoje e sem data futura
+        for occurred_at in (time.time() + 3600, time.time() - 2 * 24 * 3600):
+            response = await ac.post("/presenca/", json={"child_id": 2, "tipo": "check_in", "occurred_at": occurred_at},
+                                     headers=headers)
+            assert response.status_code == 422
+
+        present = (await ac.get("/presenca/turmas/Maternal A", headers=headers)).json()
+        assert [item["child_id"] for item in present] == [1]
+        assert (await ac.get("/presenca/", headers=headers)).json() == {"Maternal A": 1}
+
+    assert service.flush_all() == 1
+
+
+def test_tenant_logs_resolve_engine_at_flush_and_are_retired_when_idle(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_DATABASE_URL", f"sqlite:///{tmp_path}/{{tenant}}.db")
+    monkeypatch.setattr(tenancy, "tenant_engines", tenancy.TenantEngineCache(max_engines=1))
+    for tenant in ("creche-a", "creche-b"):
+        tenancy.create_tenant_db(tenant)
+
+    service = AttendanceService(flush_seconds=60, idle_seconds=0)
+    service.record("creche-a", 1, "Maternal A", PresencaTipo.CHECK_IN)
+    # Abrir outro tenant tira a engine de creche-a do LRU
+    service.record("creche-b", 2, "Maternal A", PresencaTipo.CHECK_IN)
+    assert "creche-a" not in tenancy.tenant_engines
+
+    assert service.flush_all() == 2
+    with Session(tenancy.tenant_engines.get("creche-a")) as session:
+        assert [e.child_id for e in session.exec(select(PresencaEvento)).all()] == [1]
+    # Já gravados e ociosos: saem da memória e voltam reconstruídos a partir do log
+    assert len(service) == 0
+    assert service.get_log("creche-a").present_in("Maternal A").keys() == {1}
+    tenancy.tenant_engines.clear()
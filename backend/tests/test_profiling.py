@@ -0,0 +1,94 @@
+import time
+import pytest
+from fastapi import FastAPI, HTTPException
+from httpx import AsyncClient, ASGITransport
+from auth import get_current_admin_user
+from middleware.profiling import ProfilingMiddleware, profiler
+from models.user import User, UserType
+from routes import profiling_routes
+
+
+def _busy_loop():
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+
+
+def _build_app():
+    app = FastAPI()
+
+    @app.get("/avisos/")
+    def listar():
+        _busy_loop()
+        return []
+
+    app.include_router(profiling_routes.router)
+    app.add_middleware(ProfilingMiddleware)
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    return app
+
+
+@pytest.fixture(autouse=True)
+def reset_profiler():
+    yield
+    profiler.reset()
+
+
+@pytest.mark.asyncio
+async def test_profile_next_n_requests():
+    app = _build_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/admin/profiling/requests", json={"route": "/avisos", "count": 2})
+        assert response.status_code == 202
+
+        for _ in range(3):
+            await ac.get("/avisos/")
+
+        results = (await ac.get("/admin/profiling/results")).json()
+        assert results["mode"] == "requests"
+        assert not results["running"]
+        assert results["remaining_requests"] == 0
+        assert results["requests"]["/avisos/"]["count"] == 2
+        assert results["routes"]["/avisos/"]["samples"] > 0
+
+        collapsed = (await ac.get("/admin/profiling/results/collapsed")).text
+        assert any("_busy_loop" in line for line in collapsed.splitlines())
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+
+@pytest.mark.asyncio
+async def test_window_sampler_stops_after_window():
+    app = _build_app()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/admin/profiling/sample", params={"seconds": 0.2})
+        assert response.json()["running"]
+        await ac.get("/avisos/")
+        time.sleep(0.3)
+        results = (await ac.get("/admin/profiling/results")).json()
+        assert results["mode"] == "window"
+        assert not results["running"]
+        assert results["routes"]["/avisos/"]["samples"] > 0
+
+
+def test_sampler_pauses_between_requests_and_reset_mid_request():
+    profiler.arm_requests({}, "/avisos", 3)
+    generation = profiler.begin_request("/avisos/")
+    assert profiler.sampler.running
+    profiler.end_request(generation, "/avisos/", 0.01, 0.01)
+    # Nada em andamento: o sampler não fica amostrando o processo ocioso
+    assert not profiler.sampler.running
+
+    stale = profiler.begin_request("/avisos/")
+    assert profiler.sampler.running
+    profiler.reset()
+    # Requisição da sessão anterior termina depois do reset sem quebrar
+    profiler.end_request(stale, "/avisos/", 0.01, 0.01)
+    assert profiler.in_flight == 0
+    assert profiler.requests == {}
+
+
+def test_profiling_is_admin_only():
+    teacher = User(username="lucas", email="l@test.com", hashed_password="x", full_name="Lucas", user_type=UserType.TEACHER)
+    with pytest.raises(HTTPException) as exc:
+        get_current_admin_user(teacher)
+    assert exc.value.status_code == 403
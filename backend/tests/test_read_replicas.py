@@ -0,0 +1,90 @@
+import shutil
+import pytest
+from sqlmodel import SQLModel, create_engine, select
+from starlette.requests import Request
+from auth import create_access_token
+from database import db, session as session_module
+from database.routing import ReadYourWrites
+from database.session import get_session
+from models.user import ChildParentLink
+
+
+def _request(method, user):
+    token = create_access_token({"sub": user})
+    scope = {
+        "type": "http",
+        "method": method,
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 5000),
+    }
+    return Request(scope)
+
+
+def _run(method, user, work=None):
+    dependency = get_session(_request(method, user))
+    session = next(dependency)
+    result = work(session) if work else None
+    bind = session.bind
+    with pytest.raises(StopIteration):
+        next(dependency)
+    return bind, result
+
+
+@pytest.fixture
+def engines(tmp_path, monkeypatch):
+    primary = create_engine(f"sqlite:///{tmp_path}/primary.db")
+    SQLModel.metadata.create_all(primary)
+    # Réplica local: cópia do arquivo SQLite (fica "atrasada" em relação ao primário)
+    shutil.copy(tmp_path / "primary.db", tmp_path / "replica.db")
+    replica = create_engine(f"sqlite:///{tmp_path}/replica.db")
+
+    monkeypatch.setattr(session_module, "engine", primary)
+    monkeypatch.setattr(db, "replica_engines", [replica])
+    monkeypatch.setattr(db, "_replica_cycle", iter(lambda: replica, None))
+    monkeypatch.setattr(session_module, "read_your_writes", ReadYourWrites(window_seconds=60))
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def test_reads_go_to_replica_and_writes_to_primary(engines):
+    primary, replica = engines
+    assert _run("GET", "maria")[0] is replica
+    assert _run("POST", "lucas")[0] is primary
+
+
+def test_read_your_writes_after_write(engines):
+    primary, replica = engines
+
+    def write(session):
+        session.add(ChildParentLink(parent_id=1, child_id=1))
+        session.commit()
+
+    def read(session):
+        return session.exec(select(ChildParentLink)).all()
+
+    _run("POST", "lucas", write)
+
+    bind, rows = _run("GET", "lucas", read)
+    assert bind is primary
+    assert len(rows) == 1
+
+    # Outro usuário continua lendo da réplica (que ainda não recebeu a escrita)
+    bind, rows = _run("GET", "maria", read)
+    assert bind is replica
+    assert rows == []
+
+
+def test_write_is_sticky_before_teardown(engines):
+    primary, replica = engines
+    # O teardown (após o yield) só roda depois que a resposta já foi enviada
+    writer = get_session(_request("POST", "lucas"))
+    assert next(writer).bind is primary
+    assert _run("GET", "lucas")[0] is primary
+    writer.close()
+
+
+def test_stickiness_expires():
+    tracker = ReadYourWrites(window_seconds=0)
+    tracker.mark_write("user:lucas")
+    assert not tracker.is_sticky("user:lucas")
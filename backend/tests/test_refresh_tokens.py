@@ -0,0 +1,106 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from sqlalchemy import update
+from sqlmodel import Session, select
+from main import app
+import auth
+from auth import RevocationList, revocation_list, create_refresh_token, revoke_token_family
+from models.refresh_token import RefreshToken
+from models.user import User, UserType
+from routes.token_routes import RefreshRequest, refresh_access_token
+
+
+@pytest.fixture
+def engine(db_engine, monkeypatch):
+    # Hash rápido nos testes; o formato do hash não muda o fluxo de login
+    monkeypatch.setattr(auth, "pwd_context", CryptContext(schemes=["pbkdf2_sha256"]))
+    with Session(db_engine) as session:
+        session.add(User(username="lucas", email="lucas@test.com", hashed_password=auth.get_password_hash("senha123"),
+                         full_name="Lucas", user_type=UserType.TEACHER, created_at=datetime.now(timezone.utc)))
+        session.commit()
+    return db_engine
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotation_and_reuse_detection(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        login = (await ac.post("/token", data={"username": "lucas", "password": "senha123"})).json()
+        assert login["refresh_token"]
+
+        response = await ac.post("/token/refresh", json={"refresh_token": login["refresh_token"]})
+        assert response.status_code == 200
+        rotated = response.json()
+        assert rotated["refresh_token"] != login["refresh_token"]
+
+        headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+        assert (await ac.get("/rotina/", headers=headers)).status_code == 200
+
+        # Reutilizar o refresh token antigo revoga o login inteiro
+        response = await ac.post("/token/refresh", json={"refresh_token": login["refresh_token"]})
+        assert response.status_code == 401
+        response = await ac.post("/token/refresh", json={"refresh_token": rotated["refresh_token"]})
+        assert response.status_code == 401
+        assert (await ac.get("/rotina/", headers=headers)).status_code == 401
+
+
+def test_revocation_list_syncs_from_database(engine):
+    with Session(engine) as session:
+        _, record = create_refresh_token(session, "maria")
+        session.commit()
+        family_id = record.family_id
+        revoke_token_family(session, family_id)
+        session.commit()
+
+    # Outro worker: só descobre a revogação ao sincronizar com o banco
+    other_worker = RevocationList(sync_seconds=60)
+    assert not other_worker.is_revoked(family_id)
+    other_worker.maybe_sync(engine)
+    assert other_worker.is_revoked(family_id)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_only_one_wins(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        login = (await ac.post("/token", data={"username": "lucas", "password": "senha123"})).json()
+
+        with Session(engine) as stale:
+            # Outra requisição já leu o token como ainda não usado...
+            record = stale.exec(select(RefreshToken)).one()
+            assert not record.rotated
+            # ...mas esta troca termina primeiro
+            assert (await ac.post("/token/refresh", json={"refresh_token": login["refresh_token"]})).status_code == 200
+
+            with pytest.raises(HTTPException) as exc:
+                refresh_access_token(None, RefreshRequest(refresh_token=login["refresh_token"]), stale)
+            assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_access_check_picks_up_revocation_from_other_worker(engine, monkeypatch):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        login = (await ac.post("/token", data={"username": "lucas", "password": "senha123"})).json()
+        headers = {"Authorization": f"Bearer {login['access_token']}"}
+        assert (await ac.get("/rotina/", headers=headers)).status_code == 200
+
+        # Logout feito em outro worker: só o banco sabe da revogação
+        with Session(engine) as session:
+            session.execute(update(RefreshToken).values(revoked_at=int(time.time())))
+            session.commit()
+        monkeypatch.setattr(revocation_list, "sync_seconds", 0)
+        assert (await ac.get("/rotina/", headers=headers)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_login_requires_valid_password(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for username, password in (("lucas", "errada"), ("admin", "senha123")):
+            response = await ac.post("/token", data={"username": username, "password": password})
+            assert response.status_code == 401
+            assert "refresh_token" not in response.json()
+    with Session(engine) as session:
+        assert session.exec(select(RefreshToken)).all() == []
@@ -0,0 +1,94 @@
+import pytest
+from datetime import date, datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from sqlmodel import Session, select
+from main import app
+from analytics import saude as saude_analytics
+from auth import create_access_token
+from models.saude import SaudeRecord, SaudeRollup
+from models.user import Child, User, UserType
+
+
+@pytest.fixture
+def engine(db_engine):
+    with Session(db_engine) as session:
+        birth = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        session.add(Child(id=1, name="Ana", birth_date=birth, classroom="Maternal A"))
+        session.add(Child(id=2, name="Bia", birth_date=birth, classroom="Maternal A"))
+        session.add(Child(id=3, name="Caio", birth_date=birth, classroom="Berçário"))
+        for username, user_type in (("lucas", UserType.TEACHER), ("maria", UserType.PARENT)):
+            session.add(User(username=username, email=f"{username}@test.com", hashed_password="x",
+                             full_name=username, user_type=user_type, created_at=birth))
+        session.commit()
+    return db_engine
+
+
+def _rollups(engine):
+    with Session(engine) as session:
+        rows = session.exec(select(SaudeRollup).order_by(SaudeRollup.classroom, SaudeRollup.day)).all()
+        return [(r.classroom, r.day, r.count, r.temp_count, round(r.temp_sum, 2), r.temp_max, r.fever_count) for r in rows]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("upsert", [True, False], ids=["upsert", "row-lock"])
+async def test_incremental_rollups_match_vectorized_backfill(engine, monkeypatch, upsert):
+    if not upsert:
+        monkeypatch.setattr(saude_analytics, "UPSERT_DIALECTS", {})
+    records = [
+        (1, "2025-03-03T09:00:00+00:00", 38.2),
+        (1, "2025-03-03T15:00:00+00:00", 38.5),  # mesma criança com febre: conta uma vez
+        (2, "2025-03-03T10:00:00+00:00", 36.6),
+        (2, "2025-03-03T11:00:00+00:00", None),
+        (3, "2025-03-03T10:00:00+00:00", 37.9),
+        (1, "2025-03-12T10:00:00+00:00", 36.9),
+    ]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'lucas'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for child_id, when, temperatura in records:
+            response = await ac.post("/saude/", headers=headers,
+                                     json={"child_id": child_id, "date": when, "temperatura": temperatura})
+            assert response.status_code == 200
+
+        response = await ac.get("/saude/tendencias", headers=headers,
+                                params={"start": "2025-03-01", "end": "2025-03-31", "classroom": "Maternal A", "bucket": "month"})
+        assert response.json() == [{
+            "classroom": "Maternal A", "start": "2025-03-01", "count": 5,
+            "temp_max": 38.5, "fever_child_days": 1, "temp_mean": 37.55,
+        }]
+
+    incremental = _rollups(engine)
+    assert incremental == [
+        ("Berçário", date(2025, 3, 3), 1, 1, 37.9, 37.9, 1),
+        ("Maternal A", date(2025, 3, 3), 4, 3, 113.3, 38.5, 1),
+        ("Maternal A", date(2025, 3, 12), 1, 1, 36.9, 36.9, 0),
+    ]
+
+    with Session(engine) as session:
+        assert saude_analytics.rebuild_rollups(session) == 3
+    assert _rollups(engine) == incremental
+
+
+@pytest.mark.asyncio
+async def test_trends_are_staff_only(engine):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        parent = {"Authorization": f"Bearer {create_access_token({'sub': 'maria'})}"}
+        assert (await ac.post("/saude/tendencias/recalcular", headers=parent)).status_code == 403
+        response = await ac.get("/saude/tendencias", headers=parent, params={"start": "2025-03-01", "end": "2025-03-31"})
+        assert response.status_code == 403
+        teacher = {"Authorization": f"Bearer {create_access_token({'sub': 'lucas'})}"}
+        response = await ac.post("/saude/tendencias/recalcular", headers=teacher)
+        assert response.status_code == 200
+        assert response.json() == {"rollups": 0}
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["upsert", "savepoint"])
+def test_fever_counted_once_even_if_records_are_not_visible(engine, monkeypatch, upsert):
+    if not upsert:
+        monkeypatch.setattr(saude_analytics, "UPSERT_DIALECTS", {})
+    with Session(engine) as session:
+        # Simula duas transações simultâneas: nenhuma enxerga o registro da outra
+        for hour in (9, 15):
+            record = SaudeRecord(child_id=1, date=datetime(2025, 3, 3, hour, tzinfo=timezone.utc), temperatura=38.4)
+            saude_analytics.apply_record(session, record, "Maternal A")
+        session.commit()
+    assert _rollups(engine)[0][-1] == 1
@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from starlette.requests import Request
+from auth import create_access_token
+from database import tenancy
+from database.db import engine
+from database.session import get_session
+
+
+@pytest.fixture
+def tenant_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_DATABASE_URL", f"sqlite:///{tmp_path}/{{tenant}}.db")
+    monkeypatch.setattr(tenancy, "tenant_engines", tenancy.TenantEngineCache(max_engines=2))
+    yield tmp_path
+    tenancy.tenant_engines.clear()
+
+
+def test_engine_cache_evicts_least_recently_used(tenant_dir):
+    for tenant in ("a", "b", "c"):
+        tenancy.create_tenant_db(tenant)
+    cache = tenancy.tenant_engines
+    assert len(cache) == 2
+    assert "a" not in cache
+    assert "b" in cache and "c" in cache
+
+
+def test_unknown_and_invalid_tenants_are_rejected(tenant_dir):
+    with pytest.raises(Exception) as exc:
+        tenancy.tenant_engines.get("nao-existe")
+    assert exc.value.status_code == 404
+    assert not tenancy.is_valid_tenant("../cmei_app")
+
+
+def test_tenant_tables_are_created_on_first_use(tenant_dir):
+    # Arquivo provisionado sem tabelas (ou antes de tabelas novas existirem)
+    (tenant_dir / "creche-nova.db").touch()
+    engine = tenancy.tenant_engines.get("creche-nova")
+    assert {"user", "aviso", "refreshtoken"} <= set(inspect(engine).get_table_names())
+
+
+def test_tenant_is_provisioned_once(tenant_dir, monkeypatch):
+    calls = []
+    create_all = tenancy.SQLModel.metadata.create_all
+    monkeypatch.setattr(tenancy.SQLModel.metadata, "create_all", lambda bind: calls.append(bind) or create_all(bind))
+    for tenant in ("a", "b", "c", "a"):
+        (tenant_dir / f"{tenant}.db").touch()
+        tenancy.tenant_engines.get(tenant)
+    # "a" foi descartado pelo LRU (max 2) e reaberto sem refazer o DDL
+    assert len(calls) == 3
+
+
+def test_schema_routing_is_rejected_on_sqlite(monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_ROUTING", "schema")
+    with pytest.raises(RuntimeError):
+        tenancy.check_tenant_routing(create_engine("sqlite://"))
+    monkeypatch.setattr(tenancy, "TENANT_ROUTING", "files")
+    with pytest.raises(RuntimeError):
+        tenancy.check_tenant_routing(create_engine("sqlite://"))
+
+
+def _request(headers):
+    scope = {"type": "http", "method": "GET", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]}
+    return Request(scope)
+
+
+def test_session_is_bound_to_tenant_from_token(tenant_dir):
+    tenancy.create_tenant_db("creche-a")
+    token = create_access_token({"sub": "lucas", "tenant": "creche-a"})
+
+    session = next(get_session(_request({"Authorization": f"Bearer {token}"})))
+    assert session.bind.url.database.endswith("creche-a.db")
+
+    session = next(get_session(_request({})))
+    assert session.bind is engine
+
+
+def test_tenant_from_host(tenant_dir, monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_HOST_SUFFIX", "cmei.example.com")
+    assert tenancy.resolve_tenant(_request({"Host": "creche-b.cmei.example.com:443"})) == "creche-b"
+    assert tenancy.resolve_tenant(_request({"Host": "localhost:8000"})) is None
+
+
+def test_token_must_match_tenant_host(tenant_dir, monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_HOST_SUFFIX", "cmei.example.com")
+    host = {"Host": "creche-b.cmei.example.com"}
+    own = create_access_token({"sub": "lucas", "tenant": "creche-b"})
+    assert tenancy.resolve_tenant(_request({**host, "Authorization": f"Bearer {own}"})) == "creche-b"
+
+    # Token da instalação padrão ou de outro CMEI não vale no host do tenant
+    for claims in ({"sub": "lucas"}, {"sub": "lucas", "tenant": "creche-a"}):
+        token = create_access_token(claims)
+        with pytest.raises(Exception) as exc:
+            tenancy.resolve_tenant(_request({**host, "Authorization": f"Bearer {token}"}))
+        assert exc.value.status_code == 403
+
+
+def test_engine_key_separates_schemas():
+    # Modo "schema": mesma URL, um schema por tenant (caches por banco não podem colidir)
+    a = engine.execution_options(schema_translate_map={None: "creche-a"})
+    b = engine.execution_options(schema_translate_map={None: "creche-b"})
+    assert len({tenancy.engine_key(engine), tenancy.engine_key(a), tenancy.engine_key(b)}) == 3